@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Monitoring Agent
+Lightweight push-mode alternative to SSH polling - runs on the monitored host
+
+Reads /proc, statvfs, NVML (or `nvidia-smi --query-gpu` / `--query-compute-apps`),
+the Docker socket and Ollama's /api/ps, and pushes delta-encoded snapshots to
+the collector's agent endpoint. Standard library only, so the file can be copied to a host as is:
+
+    python3 agent.py --url http://dashboard:9102/ingest --name "GPU Server 1"
+    python3 agent.py --url unix:///run/server-monitor/agent.sock --name "Local Server"
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import time
+from urllib.parse import unquote, urlparse
+from urllib.request import urlopen
+
+# Filesystems that never hold model weights or data worth alerting on
+PSEUDO_FILESYSTEMS = ('squashfs', 'overlay', 'tmpfs', 'devtmpfs')
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+GPU_QUERY = ['nvidia-smi', '--query-gpu=index,name,utilization.gpu,memory.used,memory.total,'
+             'temperature.gpu,power.draw', '--format=csv,noheader,nounits']
+GPU_UUID_QUERY = ['nvidia-smi', '--query-gpu=index,uuid', '--format=csv,noheader']
+GPU_APPS_QUERY = ['nvidia-smi', '--query-compute-apps=pid,gpu_uuid,used_memory,process_name',
+                  '--format=csv,noheader,nounits']
+OLLAMA_PS_URL = 'http://localhost:11434/api/ps'
+CONTAINER_ID_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# How far a field must move before a delta resends its section. Smaller
+# changes (and sample_seconds, the uptime clock, container ages) wait for
+# the next full snapshot, so an idle host's deltas stay nearly empty.
+MIB = 1024 * 1024
+DELTA_STEPS = {
+    'user': 2.0, 'system': 2.0, 'nice': 2.0, 'idle': 2.0, 'iowait': 2.0, 'steal': 2.0, 'busy': 2.0,
+    'mem_used': 64 * MIB, 'mem_available': 64 * MIB, 'swap_used': 64 * MIB, 'mem_percent': 1.0,
+    'used': 256 * MIB, 'available': 256 * MIB, 'used_percent': 1.0,
+    'utilization': 5.0, 'memory_used': 64 * MIB, 'memory_percent': 1.0, 'temperature': 2.0, 'power_draw': 10.0,
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a Unix domain socket"""
+
+    def __init__(self, path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def read_cpu_times():
+    """Aggregate jiffies from the first line of /proc/stat"""
+    with open('/proc/stat') as file:
+        values = [int(value) for value in file.readline().split()[1:]]
+    # user nice system idle iowait irq softirq steal
+    return (values + [0] * 8)[:8]
+
+
+def cpu_record(previous, current):
+    """CPU percentages between two /proc/stat samples, like top's %Cpu(s) line"""
+    delta = [now - before for now, before in zip(current, previous)]
+    total = sum(delta) or 1
+    user, nice, system, idle, iowait, _, _, steal = (round(100.0 * value / total, 1) for value in delta)
+    return {'user': user, 'system': system, 'nice': nice, 'idle': idle,
+            'iowait': iowait, 'steal': steal, 'busy': round(100.0 - idle, 1)}
+
+
+def read_memory():
+    values = {}
+    with open('/proc/meminfo') as file:
+        for line in file:
+            key, _, rest = line.partition(':')
+            parts = rest.split()
+            if parts and parts[0].isdigit():
+                values[key] = int(parts[0]) * 1024
+    total = values.get('MemTotal', 0)
+    available = values.get('MemAvailable', values.get('MemFree', 0))
+    return {
+        'mem_total': total,
+        'mem_used': total - available,
+        'mem_available': available,
+        'swap_total': values.get('SwapTotal', 0),
+        'swap_used': values.get('SwapTotal', 0) - values.get('SwapFree', 0),
+        'mem_percent': round(100.0 * (total - available) / total, 1) if total else 0.0,
+    }
+
+
+def read_disks():
+    """Real filesystems from /proc/mounts, sized with statvfs (no `df` fork)"""
+    disks = []
+    seen = set()
+    with open('/proc/mounts') as file:
+        for line in file:
+            device, mount, fstype = line.split()[:3]
+            if not device.startswith('/') or fstype in PSEUDO_FILESYSTEMS or device in seen:
+                continue
+            mount = mount.replace('\\040', ' ')
+            try:
+                stat = os.statvfs(mount)
+            except OSError:
+                continue
+            total = stat.f_blocks * stat.f_frsize
+            if not total:
+                continue
+            seen.add(device)
+            used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+            available = stat.f_bavail * stat.f_frsize
+            disks.append({
+                'mount': mount,
+                'filesystem': device,
+                'total': total,
+                'used': used,
+                'available': available,
+                'used_percent': round(100.0 * used / (used + available), 1) if used + available else 0.0,
+            })
+    return disks
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _gpu(index, name, utilization, memory_used, memory_total, temperature, power_draw):
+    return {
+        'index': index,
+        'name': name,
+        'utilization': utilization,
+        'memory_used': memory_used,
+        'memory_total': memory_total,
+        'temperature': temperature,
+        'power_draw': power_draw,
+        'memory_percent': round(100.0 * memory_used / memory_total, 1) if memory_total else 0.0,
+    }
+
+
+def read_gpus_nvml(nvml):
+    gpus = []
+    for index in range(nvml.nvmlDeviceGetCount()):
+        handle = nvml.nvmlDeviceGetHandleByIndex(index)
+        name = nvml.nvmlDeviceGetName(handle)
+        memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+        try:
+            power = nvml.nvmlDeviceGetPowerUsage(handle) / 1000.0
+        except nvml.NVMLError:
+            power = None
+        gpus.append(_gpu(
+            index,
+            name.decode() if isinstance(name, bytes) else name,
+            float(nvml.nvmlDeviceGetUtilizationRates(handle).gpu),
+            memory.used,
+            memory.total,
+            float(nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)),
+            power,
+        ))
+    return gpus
+
+
+def read_gpus_smi():
+    try:
+        output = subprocess.run(GPU_QUERY, capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    gpus = []
+    for line in output.splitlines():
+        parts = [part.strip() for part in line.split(',')]
+        if len(parts) != 7 or not parts[0].isdigit():
+            continue
+        index, name, utilization, memory_used, memory_total, temperature, power_draw = parts
+        # nvidia-smi reports memory in MiB
+        gpus.append(_gpu(int(index), name, _number(utilization),
+                         int(_number(memory_used) or 0) * 1024 * 1024,
+                         int(_number(memory_total) or 0) * 1024 * 1024,
+                         _number(temperature), _number(power_draw)))
+    return gpus
+
+
+def _read_text(path):
+    try:
+        with open(path, 'rb') as file:
+            return file.read().decode('utf-8', errors='replace')
+    except OSError:
+        return ''
+
+
+def describe_process(pid):
+    """Container ID (from the cgroup path) and command lines of a host PID"""
+    match = CONTAINER_ID_PATTERN.search(_read_text(f'/proc/{pid}/cgroup'))
+    cmdline = ' '.join(_read_text(f'/proc/{pid}/cmdline').split('\0')).strip()
+    stat = _read_text(f'/proc/{pid}/stat')
+    parent = stat.rpartition(')')[2].split()[1:2]
+    # vLLM workers rename themselves, so the model is often only in the parent's command line
+    parent_cmdline = ' '.join(_read_text(f'/proc/{parent[0]}/cmdline').split('\0')).strip() if parent else ''
+    return {
+        'container_id': match.group(0) if match else '',
+        'cmdline': ' '.join(f"{cmdline[:300]} {parent_cmdline[:300]}".split()),
+    }
+
+
+def read_gpu_processes_nvml(nvml):
+    processes = []
+    for index in range(nvml.nvmlDeviceGetCount()):
+        handle = nvml.nvmlDeviceGetHandleByIndex(index)
+        for process in nvml.nvmlDeviceGetComputeRunningProcesses(handle):
+            processes.append({
+                'pid': process.pid,
+                'gpu_index': index,
+                'memory_used': process.usedGpuMemory or 0,
+                'process': _read_text(f'/proc/{process.pid}/comm').strip(),
+                **describe_process(process.pid),
+            })
+    return processes
+
+
+def read_gpu_processes_smi():
+    try:
+        uuids = subprocess.run(GPU_UUID_QUERY, capture_output=True, text=True, timeout=10).stdout
+        apps = subprocess.run(GPU_APPS_QUERY, capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    indexes = {}
+    for line in uuids.splitlines():
+        index, _, uuid = (part.strip() for part in line.partition(','))
+        if index.isdigit():
+            indexes[uuid] = int(index)
+    processes = []
+    for line in apps.splitlines():
+        parts = [part.strip() for part in line.split(',', 3)]
+        if len(parts) != 4 or not parts[0].isdigit():
+            continue
+        pid, uuid, memory_used, name = parts
+        processes.append({
+            'pid': int(pid),
+            'gpu_index': indexes.get(uuid, -1),
+            'memory_used': int(_number(memory_used) or 0) * 1024 * 1024,
+            'process': name,
+            **describe_process(pid),
+        })
+    return processes
+
+
+def read_ollama_models():
+    """[name, VRAM bytes] for the models a local Ollama has loaded"""
+    try:
+        with urlopen(OLLAMA_PS_URL, timeout=2) as response:
+            models = json.loads(response.read()).get('models') or []
+    except (OSError, ValueError, AttributeError):
+        return []
+    return [[model.get('name', ''), int(model.get('size_vram') or 0)] for model in models]
+
+
+def read_containers():
+    """Running containers from the Docker Engine API, or None if Docker isn't reachable"""
+    if not os.path.exists(DOCKER_SOCKET):
+        return None
+    conn = UnixHTTPConnection(DOCKER_SOCKET, timeout=5)
+    try:
+        conn.request('GET', '/containers/json')
+        response = conn.getresponse()
+        if response.status != 200:
+            return None
+        containers = json.loads(response.read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+    return [{
+        'id': container['Id'][:12],
+        'image': container.get('Image', ''),
+        'name': (container.get('Names') or ['/'])[0].lstrip('/'),
+        'status': container.get('Status', ''),
+    } for container in containers]
+
+
+def read_uptime():
+    """Text in the style of the `uptime` command"""
+    with open('/proc/uptime') as file:
+        seconds = int(float(file.read().split()[0]))
+    with open('/proc/loadavg') as file:
+        load = file.read().split()[:3]
+    days, rest = divmod(seconds, 86400)
+    hours, minutes = divmod(rest // 60, 60)
+    up = f"{days} day{'s' if days != 1 else ''}, {hours:2d}:{minutes:02d}" if days else f"{hours:2d}:{minutes:02d}"
+    return f" {time.strftime('%H:%M:%S')} up {up},  load average: {', '.join(load)}"
+
+
+class Sampler:
+    """Takes metric snapshots, keeping the state needed for CPU deltas"""
+
+    def __init__(self):
+        self._cpu_times = read_cpu_times()
+        self._nvml = None
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            self._nvml = pynvml
+        except Exception:
+            pass  # No NVML bindings or no driver - fall back to nvidia-smi
+
+    def sample(self):
+        started = time.time()
+        cpu_times = read_cpu_times()
+        if cpu_times == self._cpu_times:
+            time.sleep(0.5)  # First sample: need an interval to measure over
+            cpu_times = read_cpu_times()
+        cpu = cpu_record(self._cpu_times, cpu_times)
+        self._cpu_times = cpu_times
+
+        try:
+            gpus = read_gpus_nvml(self._nvml) if self._nvml else read_gpus_smi()
+        except Exception:
+            gpus = read_gpus_smi()
+        try:
+            gpu_apps = read_gpu_processes_nvml(self._nvml) if self._nvml else read_gpu_processes_smi()
+        except Exception:
+            gpu_apps = read_gpu_processes_smi()
+
+        return {
+            'uptime': read_uptime(),
+            'cpu': cpu,
+            'memory': read_memory(),
+            'disks': read_disks(),
+            'gpus': gpus,
+            'containers': read_containers(),
+            'gpu_apps': gpu_apps,
+            'ollama_models': read_ollama_models() if gpu_apps else [],
+            'sample_seconds': round(time.time() - started, 3),
+        }
+
+
+def _quantise(value, field=None):
+    if isinstance(value, dict):
+        return {key: _quantise(item, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_quantise(item, field) for item in value]
+    step = DELTA_STEPS.get(field)
+    if step and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(value / step)
+    if field == 'status' and isinstance(value, str):
+        return value.split(' ', 1)[0]  # "Up 5 minutes" -> "Up"
+    return value
+
+
+def delta_signature(key, value):
+    """What a section is compared on when deciding whether a delta resends it"""
+    if key == 'sample_seconds':
+        return None
+    if key == 'uptime' and value:
+        try:
+            return [round(float(load) * 2) / 2 for load in value.rpartition('load average:')[2].split(',')]
+        except ValueError:
+            return value
+    return _quantise(value)
+
+
+class DeltaEncoder:
+    """Sends only the sections that changed meaningfully since they were last sent
+
+    Sections are compared on delta_signature() against the last values
+    actually sent, so slow drift still goes out once it adds up to a step.
+    Every ``full_every`` pushes (and after reset()) the whole, exact snapshot
+    is sent, so the collector can always resynchronise.
+    """
+
+    def __init__(self, full_every=20):
+        self.full_every = full_every
+        self.seq = 0
+        self._sent = None  # key -> signature of the last value sent
+        self._since_full = 0
+
+    def encode(self, snapshot):
+        self.seq += 1
+        signatures = {key: delta_signature(key, value) for key, value in snapshot.items()}
+        if self._sent is None or self._since_full >= self.full_every:
+            sections, base = snapshot, None
+            self._sent = signatures
+            self._since_full = 0
+        else:
+            sections = {key: value for key, value in snapshot.items() if self._sent.get(key) != signatures[key]}
+            self._sent.update((key, signatures[key]) for key in sections)
+            base = self.seq - 1
+            self._since_full += 1
+        return {'seq': self.seq, 'base': base, 'sections': sections}
+
+    def reset(self):
+        self._sent = None
+
+
+class Pusher:
+    """POSTs payloads to an http:// or unix:// agent endpoint"""
+
+    def __init__(self, url, token='', timeout=10):
+        parsed = urlparse(url)
+        self.scheme = parsed.scheme
+        self.target = parsed
+        self.token = token
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.scheme == 'unix':
+            return UnixHTTPConnection(unquote(self.target.path), timeout=self.timeout)
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.target.hostname, self.target.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.target.hostname, self.target.port or 80, timeout=self.timeout)
+
+    def push(self, payload):
+        """Send one payload, returning the HTTP status"""
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        path = '/ingest' if self.scheme == 'unix' else (self.target.path or '/ingest')
+        conn = self._connection()
+        try:
+            conn.request('POST', path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push host metrics to the monitoring dashboard")
+    parser.add_argument('--url', default=os.environ.get('AGENT_URL', 'http://localhost:9102/ingest'),
+                        help="Collector endpoint (http://host:port/ingest or unix:///path/to.sock)")
+    parser.add_argument('--name', default=os.environ.get('AGENT_NAME', socket.gethostname()),
+                        help="Server name as listed in the dashboard's servers.yml")
+    parser.add_argument('--token', default=os.environ.get('AGENT_TOKEN', ''))
+    parser.add_argument('--interval', type=float, default=float(os.environ.get('AGENT_INTERVAL', 15)))
+    parser.add_argument('--full-every', type=int, default=20, help="Send a full snapshot every N pushes")
+    args = parser.parse_args()
+
+    sampler = Sampler()
+    encoder = DeltaEncoder(args.full_every)
+    pusher = Pusher(args.url, args.token)
+    print(f"📤 Pushing metrics for '{args.name}' to {args.url} every {args.interval:.0f}s")
+
+    while True:
+        started = time.time()
+        payload = encoder.encode(sampler.sample())
+        payload.update(name=args.name, interval=args.interval)
+        try:
+            status = pusher.push(payload)
+            if status != 200:
+                # 409 means the collector lost our base snapshot (e.g. it restarted)
+                print(f"⚠️ Push rejected with HTTP {status}, sending a full snapshot next")
+                encoder.reset()
+        except (OSError, http.client.HTTPException) as e:
+            print(f"⚠️ Push failed: {e}")
+            encoder.reset()
+        time.sleep(max(0.0, args.interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    main()
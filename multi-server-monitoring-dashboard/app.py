@@ -1,63 +1,114 @@
 import streamlit as st
-import paramiko
-import json
 import pandas as pd
-from datetime import datetime
 import time
-import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import yaml
 import os
 import bcrypt
 
+from circuit import get_breakers
+from collector import Collector, SnapshotStore
+from config import get_config
+from exporter import MetricsExporter
+from history import SERIES, HistoryStore
+from ingest import AgentReceiver, is_agent_host
+from parsers import fleet_frame, parse_metrics
+from probe import (COMMANDS, FALLBACK_CHANNELS, build_probe_script, format_section,
+                   new_host_data, parse_probe_output, probe_command, set_status)
+from scheduler import AdaptiveScheduler
+from sharding import ShardedSnapshotStore
+from ssh_pool import get_pool
+
+# "probe" sends one composite script per server, "commands" runs one channel per command
+COLLECTION_MODE = os.environ.get('COLLECTION_MODE', 'probe')
+PROBE_TIMEOUT = int(os.environ.get('PROBE_TIMEOUT', 15))
+
+# "threads" uses ServerMonitor (paramiko), "async" uses AsyncServerMonitor (asyncssh)
+COLLECTION_ENGINE = os.environ.get('COLLECTION_ENGINE', 'threads')
+ASYNC_MAX_CONCURRENCY = int(os.environ.get('ASYNC_MAX_CONCURRENCY', 200))
+ASYNC_HOST_TIMEOUT = int(os.environ.get('ASYNC_HOST_TIMEOUT', 20))
+# Limit concurrent connections to avoid Paramiko race conditions
+MAX_PARALLEL = 6
+
+# "thread" runs the collector inside the dashboard process, "external" reads
+# the snapshot file written by a standalone `python collector.py`
+COLLECTOR_MODE = os.environ.get('COLLECTOR_MODE', 'thread')
+COLLECTOR_INTERVAL = int(os.environ.get('COLLECTOR_INTERVAL', os.environ.get('DEFAULT_REFRESH_INTERVAL', 60)))
+SNAPSHOT_FILE = os.environ.get('SNAPSHOT_FILE', 'snapshot.json')
+# Standalone collector processes the inventory is split across (external mode reads all their snapshots)
+COLLECTOR_SHARDS = int(os.environ.get('COLLECTOR_SHARDS', 1))
+# Longest a page run waits for in-flight hosts to report before rendering what it has
+STREAM_TIMEOUT = int(os.environ.get('STREAM_TIMEOUT', 5))
+# Page loads serve cached host data; hosts older than this many seconds are re-collected in the background.
+# The default only catches hosts that missed a sweep - anything shorter than the interval re-polls the fleet.
+SNAPSHOT_TTL = int(os.environ.get('SNAPSHOT_TTL', 2 * COLLECTOR_INTERVAL))
+# Give each host its own polling interval based on load, volatility and priority
+ADAPTIVE_POLLING = os.environ.get('ADAPTIVE_POLLING', 'false').lower() == 'true'
+
+# Metric history database (set HISTORY_DB= to disable) and sparkline window
+HISTORY_DB = os.environ.get('HISTORY_DB', 'history.db')
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 30))
+SPARKLINE_HOURS = 6
+
+# Serve Prometheus metrics from the collector's snapshot on this port (0 disables)
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+
+# Endpoint for hosts with `mode: agent` that push metrics via agent.py (TCP port and/or Unix socket).
+# The TCP port only listens when AGENT_TOKEN is set - anyone who can reach it could push fake host data.
+AGENT_PORT = int(os.environ.get('AGENT_PORT', 9102))
+AGENT_SOCKET = os.environ.get('AGENT_SOCKET', '')
+AGENT_TOKEN = os.environ.get('AGENT_TOKEN', '')
+
+# Fleet overview columns and their display names
+FLEET_COLUMNS = {
+    'server': 'Server',
+    'status': 'Status',
+    'cpu_percent': 'CPU %',
+    'mem_percent': 'Memory %',
+    'disk_max_percent': 'Worst Disk %',
+    'containers': 'Containers',
+    'gpu': 'GPU',
+    'gpu_name': 'GPU Model',
+    'gpu_util': 'GPU Util %',
+    'vram_used_gb': 'VRAM Used (GB)',
+    'vram_percent': 'VRAM %',
+}
+PERCENT_COLUMNS = ('cpu_percent', 'mem_percent', 'disk_max_percent', 'gpu_util', 'vram_percent')
+
+# GPU process table columns (GPU tab) and change markers
+GPU_PROCESS_COLUMNS = {
+    'gpu_index': 'GPU',
+    'pid': 'PID',
+    'process': 'Process',
+    'container': 'Container',
+    'model': 'Model',
+    'vram_gb': 'VRAM (GB)',
+}
+GPU_CHANGE_COLUMNS = {'change': 'Change', **GPU_PROCESS_COLUMNS, 'delta_gb': 'Change (GB)'}
+GPU_CHANGE_ICONS = {'started': '🆕 started', 'exited': '⏹️ exited', 'grew': '📈 grew', 'shrank': '📉 shrank'}
+
 class ServerMonitor:
     def __init__(self, config_file='servers.yml'):
         self.config_file = config_file
-        self.servers = self.load_servers()
+        # Shared, mtime-cached servers.yml - reruns don't re-parse it
+        self.config = get_config(config_file)
+        self.pool = get_pool()
+        self.breakers = get_breakers()
 
-    def load_servers(self):
-        try:
-            with open(self.config_file, 'r') as file:
-                config = yaml.safe_load(file)
-                return config.get('servers', [])
-        except FileNotFoundError:
-            st.error(f"Configuration file {self.config_file} not found!")
-            return []
-        except Exception as e:
-            st.error(f"Error loading configuration: {str(e)}")
-            return []
+    @property
+    def servers(self):
+        """Current servers, re-read from disk only when servers.yml changes"""
+        return self.config.servers
 
     def ssh_execute(self, server, command):
         """Execute command on remote server via SSH"""
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-            # Expand user path for SSH key
-            key_file = server.get('key_file')
-            if key_file:
-                key_file = os.path.expanduser(key_file)
-
-            # Connect with key-based authentication
-            ssh.connect(
-                hostname=server['host'],
-                port=server.get('port', 22),
-                username=server['username'],
-                key_filename=key_file,
-                timeout=10
-            )
-            
-            stdin, stdout, stderr = ssh.exec_command(command)
-            output = stdout.read().decode('utf-8')
-            error = stderr.read().decode('utf-8')
-            
-            ssh.close()
-            
+            output, error, _ = self.pool.exec_command(server, command, timeout=10)
+
             if error and 'command not found' not in error.lower():
                 return f"Error: {error}"
-            
+
             return output
-            
+
         except Exception as e:
             return f"Connection Error: {str(e)}"
 
@@ -91,102 +142,462 @@ class ServerMonitor:
         output = self.ssh_execute(server, "top -bn1 | grep 'Cpu(s)' | head -1")
         return output
 
-    def collect_all_data(self, server):
-        """Collect all monitoring data for a server using a single SSH connection"""
-        data = {
-            'server': server['name'],
-            'host': server['host'],
-            'status': 'Unknown',
-            'uptime': '',
-            'cpu': '',
-            'disk': '',
-            'memory': '',
-            'nvidia': '',
-            'docker': '',
-            'last_updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-
-        ssh = None
-        try:
-            # Small delay to avoid Paramiko race conditions
-            import random
-            time.sleep(random.uniform(0.01, 0.05))
-
-            # Use single SSH connection for all commands
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-            # Expand user path for SSH key
-            key_file = server.get('key_file')
-            if key_file:
-                key_file = os.path.expanduser(key_file)
-
-            # Connect with optimized timeout for speed
-            ssh.connect(
-                hostname=server['host'],
-                port=server.get('port', 22),
-                username=server['username'],
-                key_filename=key_file,
-                timeout=8,
-                banner_timeout=8,
-                auth_timeout=8,
-                look_for_keys=False,  # Only use specified key
-                allow_agent=False  # Don't use SSH agent (avoids hangs)
-            )
+    def run_probe(self, server):
+        """Run all monitoring commands as one composite probe (single round trip)"""
+        script, nonce = build_probe_script(COMMANDS)
+        output, _, _ = self.pool.exec_command(server, probe_command(script), timeout=PROBE_TIMEOUT)
+        return parse_probe_output(output, nonce, COMMANDS)
+
+    def run_commands(self, server, data):
+        """Run monitoring commands one per channel (fallback path)
+
+        Channels share the pooled connection and run FALLBACK_CHANNELS at a
+        time, so a host whose probe failed costs a few command timeouts, not
+        one per command.
+        """
+        def run_one(key, command):
+            try:
+                return key, self.pool.exec_command(server, command, timeout=5)
+            except Exception as cmd_error:
+                data[key] = f"Error: {str(cmd_error)}"
+                return key, None
+
+        with ThreadPoolExecutor(max_workers=FALLBACK_CHANNELS) as executor:
+            results = list(executor.map(lambda item: run_one(*item), COMMANDS.items()))
+        return {key: result for key, result in results if result is not None}
 
-            # Execute all commands in one batch for speed
-            commands = {
-                'uptime': 'uptime',
-                'cpu': "top -bn1 | grep 'Cpu(s)' | head -1",
-                'disk': 'df -h',
-                'memory': 'free -h',
-                'nvidia': 'nvidia-smi 2>/dev/null || echo "Not available"',
-                'docker': 'docker ps 2>/dev/null || echo "Not available"'
-            }
-
-            for key, command in commands.items():
-                try:
-                    # Use exec_command with proper channel handling
-                    stdin, stdout, stderr = ssh.exec_command(command, timeout=5)
+    def collect_all_data(self, server):
+        """Collect all monitoring data for a server over its pooled SSH connection"""
+        # Hosts with an open circuit return cached offline data instantly
+        breaker = self.breakers.get(server)
+        if not breaker.allow_request():
+            return breaker.offline_data(server)
 
-                    # Read output and wait for command to complete
-                    output = stdout.read().decode('utf-8', errors='ignore').strip()
-                    error_output = stderr.read().decode('utf-8', errors='ignore').strip()
+        data = new_host_data(server)
+        started = time.time()
 
-                    # Wait for channel to close properly
-                    stdout.channel.recv_exit_status()
+        try:
+            # Reuse the pooled connection for this server (connects on first use)
+            try:
+                self.pool.get_client(server)
+            except Exception as e:
+                breaker.record_failure(e)
+                raise
+            breaker.record_success()
+
+            sections = None
+            if COLLECTION_MODE == 'probe' and server.get('probe', True):
+                try:
+                    sections = self.run_probe(server)
+                    data['collection_mode'] = 'probe'
+                except Exception:
+                    sections = None  # Fall back to one command per channel
 
-                    # If we got output, use it; otherwise check for errors
-                    if output:
-                        data[key] = output
-                    elif error_output and 'not found' not in error_output.lower():
-                        data[key] = f"Error: {error_output}"
-                    else:
-                        data[key] = "Not available"
+            if sections is None:
+                sections = self.run_commands(server, data)
+                data['collection_mode'] = 'commands'
 
-                except Exception as cmd_error:
-                    data[key] = f"Error: {str(cmd_error)}"
+            for key, (output, error_output, _) in sections.items():
+                data[key] = format_section(output, error_output)
 
             # Set status based on uptime
-            if data.get('uptime') and not data['uptime'].startswith('Error'):
-                data['status'] = '🟢 Online'
-            else:
-                data['status'] = '🔴 Offline'
+            set_status(data)
+            data['metrics'] = parse_metrics(data)
+            breaker.remember(data)
 
         except Exception as e:
             data['status'] = f'🔴 Error: {str(e)}'
             data['uptime'] = f"Connection Error: {str(e)}"
 
-        finally:
-            # Always close SSH connection, even on error
-            if ssh is not None:
-                try:
-                    ssh.close()
-                except:
-                    pass  # Ignore errors during cleanup
-
+        data['collect_seconds'] = round(time.time() - started, 3)
         return data
 
+    def collect_many(self, servers=None, on_result=None):
+        """Collect from many servers concurrently
+
+        Calls on_result(data) as each server finishes and returns all results.
+        """
+        servers = self.servers if servers is None else servers
+        servers = [server for server in servers if not is_agent_host(server)]
+        if not servers:
+            return []
+
+        all_data = []
+        max_parallel = min(MAX_PARALLEL, len(servers))
+
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = [executor.submit(self.collect_all_data, server) for server in servers]
+            for future in as_completed(futures):
+                data = future.result()
+                all_data.append(data)
+                if on_result is not None:
+                    on_result(data)
+
+        return all_data
+
+def create_monitor(config_file='servers.yml'):
+    """Create the monitor for the configured COLLECTION_ENGINE"""
+    monitor = ServerMonitor(config_file)
+    if COLLECTION_ENGINE == 'async':
+        from async_collector import AsyncServerMonitor
+        return AsyncServerMonitor(
+            monitor.config,
+            max_concurrency=ASYNC_MAX_CONCURRENCY,
+            host_timeout=ASYNC_HOST_TIMEOUT,
+            probe_timeout=PROBE_TIMEOUT,
+            use_probe=COLLECTION_MODE == 'probe'
+        )
+    return monitor
+
+def create_history():
+    """Open the metric history store, or None if HISTORY_DB is empty"""
+    if not HISTORY_DB:
+        return None
+    return HistoryStore(HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS)
+
+def create_scheduler():
+    """Adaptive per-host scheduler, or None for fixed-interval sweeps"""
+    if not ADAPTIVE_POLLING:
+        return None
+    return AdaptiveScheduler(base_interval=COLLECTOR_INTERVAL)
+
+def create_agent_receiver(monitor):
+    """Receiver for agent-pushed hosts, or None if every host is polled over SSH"""
+    servers = [server for server in monitor.servers if is_agent_host(server)]
+    port = AGENT_PORT if AGENT_TOKEN else 0
+    if servers and AGENT_PORT and not AGENT_TOKEN:
+        print(f"⚠️ Agent TCP endpoint on port {AGENT_PORT} disabled: set AGENT_TOKEN to accept pushes over TCP")
+    if not servers or not (port or AGENT_SOCKET):
+        return None
+    return AgentReceiver(servers, port=port, socket_path=AGENT_SOCKET or None, token=AGENT_TOKEN,
+                         stale_after=max(60, COLLECTOR_INTERVAL))
+
+@st.cache_resource
+def get_history():
+    return create_history()
+
+@st.cache_resource
+def get_collector():
+    """Start one background collector per Streamlit server process"""
+    monitor = create_monitor()
+    collector = Collector(monitor, SnapshotStore(), interval=COLLECTOR_INTERVAL,
+                          history=get_history(), scheduler=create_scheduler(),
+                          agents=create_agent_receiver(monitor)).start()
+    if METRICS_PORT:
+        MetricsExporter(collector.store, port=METRICS_PORT).start()
+    return collector
+
+@st.cache_resource
+def get_external_store():
+    """Snapshot store backed by the file(s) standalone collectors write"""
+    if COLLECTOR_SHARDS > 1:
+        return ShardedSnapshotStore(SNAPSHOT_FILE, COLLECTOR_SHARDS)
+    return SnapshotStore(SNAPSHOT_FILE)
+
+def stream_snapshots(store, snapshot, collector, names, timeout=STREAM_TIMEOUT):
+    """Yield newer snapshots as in-flight hosts arrive, for at most ``timeout`` seconds
+
+    Only hosts the collector is collecting right now are waited for - one just
+    added to servers.yml, an agent host or a host on a stopped shard may never
+    report, and the page shouldn't stall on it. Waits on the store's update
+    notification, so each yield follows the next host to finish rather than
+    the slowest one. External collectors publish only at the end of a sweep,
+    so there is nothing to stream from them.
+    """
+    if collector is None:
+        return
+    deadline = time.time() + timeout
+    while time.time() < deadline and collector.pending([name for name in names if name not in snapshot['hosts']]):
+        store.wait_for_update(snapshot['version'], min(0.5, max(0, deadline - time.time())))
+        latest = store.latest()
+        if latest['version'] != snapshot['version']:
+            snapshot = latest
+            yield snapshot
+
+def format_age(seconds):
+    """Compact age for badges, e.g. 42s, 5m, 3h"""
+    seconds = int(max(0, seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h"
+
+def age_badge(data):
+    """Age of a host's cached data, highlighted once it's past SNAPSHOT_TTL"""
+    if not data.get('collected_at'):
+        return ''
+    age = time.time() - data['collected_at']
+    color = "orange" if age > SNAPSHOT_TTL else "gray"
+    return f'<span style="color: {color};">🕒 {format_age(age)} ago</span>'
+
+def render_server_card(data):
+    """Status card for one server"""
+    status_color = "green" if "🟢" in data['status'] else "red"
+    st.markdown(
+        f"""
+        <div style="border: 2px solid {status_color}; border-radius: 10px; padding: 10px; margin: 5px;">
+            <h4>{data['server']}</h4>
+            <p><strong>Status:</strong> {data['status']}</p>
+            <p><strong>Host:</strong> {data['host']}</p>
+            <p><strong>Updated:</strong> {data['last_updated']} {age_badge(data)}</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+def render_pending_card(server):
+    """Placeholder card for a server whose first collection hasn't finished"""
+    st.markdown(
+        f"""
+        <div style="border: 2px dashed gray; border-radius: 10px; padding: 10px; margin: 5px;">
+            <h4>{server['name']}</h4>
+            <p><strong>Status:</strong> ⏳ Collecting...</p>
+            <p><strong>Host:</strong> {server['host']}</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+def render_history(data, history):
+    """Render metric history charts for one server"""
+    col1, col2 = st.columns(2)
+    metric = col1.selectbox("Metric", list(SERIES), format_func=SERIES.get, key="history_metric")
+    hours = col2.selectbox("Range", [1, 6, 24, 72, 168], index=2, key="history_range",
+                           format_func=lambda h: f"{h}h" if h < 24 else f"{h // 24}d")
+
+    frame = history.query(metric, time.time() - hours * 3600, servers=[data['server']])
+    if frame.empty:
+        st.info("No history recorded yet")
+    else:
+        st.line_chart(frame, x='ts', y='value')
+
+def render_gpu_processes(data):
+    """Per-process VRAM with the changes since the previous collection first"""
+    processes = (data.get('metrics') or {}).get('gpu_processes')
+    if not processes:
+        return
+
+    changes = data.get('gpu_changes')
+    if changes:
+        st.write("**Changes since the previous collection**")
+        frame = pd.DataFrame(changes)
+        frame['change'] = frame['change'].map(GPU_CHANGE_ICONS)
+        frame['vram_gb'] = frame['memory_used'] / 1024 ** 3
+        frame['delta_gb'] = frame['delta'] / 1024 ** 3
+        st.dataframe(frame[list(GPU_CHANGE_COLUMNS)], hide_index=True,
+                     column_config={**GPU_CHANGE_COLUMNS,
+                                    'vram_gb': st.column_config.NumberColumn("VRAM (GB)", format="%.2f"),
+                                    'delta_gb': st.column_config.NumberColumn("Change (GB)", format="%+.2f")})
+    elif changes is not None:
+        st.caption("No GPU process changes since the previous collection")
+
+    frame = pd.DataFrame(processes)
+    frame['vram_gb'] = frame['memory_used'] / 1024 ** 3
+    by_owner = (frame.assign(owner=frame['model'].where(frame['model'] != '', frame['container']))
+                .groupby(['gpu_index', 'owner'], as_index=False)['vram_gb'].sum())
+    with st.expander(f"All GPU processes ({len(frame)})", expanded=not changes):
+        st.dataframe(frame[list(GPU_PROCESS_COLUMNS)], hide_index=True,
+                     column_config={**GPU_PROCESS_COLUMNS,
+                                    'vram_gb': st.column_config.NumberColumn("VRAM (GB)", format="%.2f")})
+        st.write("**VRAM by model / container**")
+        st.dataframe(by_owner, hide_index=True, column_config={
+            'gpu_index': "GPU", 'owner': "Model / container",
+            'vram_gb': st.column_config.NumberColumn("VRAM (GB)", format="%.2f")})
+
+def render_server_details(data, history=None):
+    """Render the detail tabs for one server"""
+    st.header(f"🖥️ {data['server']} ({data['host']})")
+    if data.get('collected_at'):
+        st.markdown(age_badge(data), unsafe_allow_html=True)
+
+    if "🔴" in data['status']:
+        st.error(f"Server is offline or unreachable: {data['status']}")
+        return
+
+    # Create tabs for different metrics
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+        "💽 Disk Usage", 
+        "🧠 Memory", 
+        "🎮 GPU (NVIDIA)", 
+        "🐳 Docker", 
+        "📈 System Info",
+        "📉 History"
+    ])
+
+    with tab1:
+        st.subheader("Disk Usage")
+        if data['disk']:
+            st.code(data['disk'], language='bash')
+        else:
+            st.info("No disk information available")
+
+    with tab2:
+        st.subheader("Memory Usage")
+        if data['memory']:
+            st.code(data['memory'], language='bash')
+        else:
+            st.info("No memory information available")
+
+    with tab3:
+        st.subheader("NVIDIA GPU Information")
+        if data['nvidia'] and "command not found" not in data['nvidia']:
+            st.code(data['nvidia'], language='bash')
+            render_gpu_processes(data)
+        else:
+            st.info("NVIDIA drivers not installed or nvidia-smi not available")
+
+    with tab4:
+        st.subheader("Docker Containers")
+        if data['docker'] and "Cannot connect" not in data['docker']:
+            st.code(data['docker'], language='bash')
+        else:
+            st.info("Docker not running or not accessible")
+
+    with tab5:
+        st.subheader("System Information")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Uptime:**")
+            st.code(data['uptime'])
+        with col2:
+            st.write("**CPU Usage:**")
+            st.code(data['cpu'])
+
+    with tab6:
+        st.subheader("Metric History")
+        if history is not None:
+            render_history(data, history)
+        else:
+            st.info("History is disabled (HISTORY_DB is empty)")
+
+def render_fleet_overview(all_data, history=None):
+    """Render one sortable, filterable table for the whole fleet (one row per host/GPU)"""
+    st.header("📋 Fleet Overview")
+
+    frame = fleet_frame(all_data)
+
+    with st.expander("🔎 Filter & Sort", expanded=False):
+        col1, col2, col3, col4 = st.columns(4)
+        min_cpu = col1.slider("Min CPU %", 0, 100, 0)
+        min_mem = col2.slider("Min Memory %", 0, 100, 0)
+        min_disk = col3.slider("Min Disk %", 0, 100, 0)
+        min_gpu = col4.slider("Min GPU Util %", 0, 100, 0)
+
+        col5, col6 = st.columns(2)
+        sort_by = col5.selectbox("Sort by", list(FLEET_COLUMNS), format_func=FLEET_COLUMNS.get)
+        descending = col6.checkbox("Descending", value=False)
+
+    # Vectorized threshold filters - rows with no data only pass a zero threshold
+    mask = pd.Series(True, index=frame.index)
+    for column, minimum in (('cpu_percent', min_cpu), ('mem_percent', min_mem),
+                            ('disk_max_percent', min_disk), ('gpu_util', min_gpu)):
+        if minimum > 0:
+            mask &= frame[column] >= minimum
+    frame = frame[mask].sort_values(sort_by, ascending=not descending, na_position='last')
+
+    columns = list(FLEET_COLUMNS)
+    column_config = {}
+    if history is not None:
+        # Sparklines from the last few hours of history
+        since = time.time() - SPARKLINE_HOURS * 3600
+        for metric, column in (('cpu_percent', 'cpu_trend'), ('vram_used_gb', 'vram_trend')):
+            frame[column] = frame['server'].map(history.sparklines(metric, since))
+            columns.append(column)
+            column_config[column] = st.column_config.LineChartColumn(
+                f"{SERIES[metric]} ({SPARKLINE_HOURS}h)", y_min=0, y_max=100 if metric == 'cpu_percent' else None
+            )
+
+    # Percentages render as bars, everything else with its display name
+    column_config.update({
+        column: st.column_config.ProgressColumn(label, min_value=0, max_value=100, format="%.0f%%")
+        if column in PERCENT_COLUMNS else label
+        for column, label in FLEET_COLUMNS.items()
+    })
+    column_config['vram_used_gb'] = st.column_config.NumberColumn(FLEET_COLUMNS['vram_used_gb'], format="%.1f")
+
+    st.dataframe(frame[columns], hide_index=True, column_config=column_config)
+    st.caption(f"{frame['server'].nunique()} of {len(all_data)} servers match")
+
+def render_dashboard(store, collector, servers):
+    """Render the data regions from the latest snapshot
+
+    Runs as a Streamlit fragment, so auto-refresh and widget clicks inside it
+    re-render only this part of the page.
+    """
+    if collector is not None:
+        # Stale-while-revalidate: this run renders the cached snapshot while
+        # expired hosts are re-collected in the background
+        collector.revalidate(SNAPSHOT_TTL)
+
+    # Read the latest snapshot published by the collector. Hosts still being
+    # collected get placeholders that fill in as their data arrives below.
+    snapshot = store.latest()
+    if snapshot['sweep_finished']:
+        st.caption(f"⏱️ Last collection: {int(time.time() - snapshot['sweep_finished'])}s ago")
+    else:
+        st.caption("⏱️ First collection in progress...")
+
+    if not servers:
+        st.info("No servers match the selected groups/tags.")
+        return
+
+    names = [server['name'] for server in servers]
+    all_data = [snapshot['hosts'][name] for name in names if name in snapshot['hosts']]
+
+    # Server status overview - cards keep servers.yml order whatever order hosts finish in
+    st.header("📊 Server Status Overview")
+
+    # Use grid layout - max 4 columns per row for better readability
+    servers_per_row = min(4, len(servers))
+
+    # Create rows of server cards
+    card_slots = {}
+    for row_start in range(0, len(servers), servers_per_row):
+        row_servers = servers[row_start:row_start + servers_per_row]
+        cols = st.columns(len(row_servers))
+
+        for i, server in enumerate(row_servers):
+            with cols[i]:
+                card_slots[server['name']] = slot = st.empty()
+                with slot.container():
+                    if server['name'] in snapshot['hosts']:
+                        render_server_card(snapshot['hosts'][server['name']])
+                    else:
+                        render_pending_card(server)
+
+    history = get_history()
+    if all_data:
+        render_fleet_overview(all_data, history)
+    if len(all_data) < len(names):
+        st.caption(f"⏳ {len(all_data)} of {len(names)} servers reported - waiting for the rest")
+
+    # Per-server details render only for the selected server
+    st.header("🔍 Server Details")
+    selected = st.selectbox("Server", names)
+    details_slot = st.empty()
+    if selected in snapshot['hosts']:
+        with details_slot.container():
+            render_server_details(snapshot['hosts'][selected], history)
+    else:
+        details_slot.info(f"⏳ Waiting for {selected}...")
+
+    # Stream in hosts that hadn't reported yet, fastest first
+    pending = set(names) - set(snapshot['hosts'])
+    for snapshot in stream_snapshots(store, snapshot, collector, names):
+        for name in [name for name in pending if name in snapshot['hosts']]:
+            pending.discard(name)
+            with card_slots[name].container():
+                render_server_card(snapshot['hosts'][name])
+            if name == selected:
+                with details_slot.container():
+                    render_server_details(snapshot['hosts'][name], history)
+
+    arrived = len(names) - len(all_data) - len(pending)
+    if arrived and not (collector and collector.pending(list(pending))):
+        # Nothing left in flight - rerun once so the fleet table includes the hosts that arrived
+        st.rerun()
+
 def check_password():
     """Check if password authentication is required and validate"""
     # Get password hash from environment variable
@@ -250,12 +661,26 @@ def main():
     monitor = ServerMonitor()
 
     if not monitor.servers:
+        for error in monitor.config.errors:
+            st.error(error)
         st.warning("No servers configured. Please check your servers.yml file.")
         return
-
-    # Initialize session state for timing
-    if 'last_refresh' not in st.session_state:
-        st.session_state.last_refresh = time.time()
+    if monitor.config.errors:
+        with st.expander(f"⚠️ {len(monitor.config.errors)} problem(s) in servers.yml - affected entries are skipped"):
+            for error in monitor.config.errors:
+                st.write(f"- {error}")
+    if monitor.config.warnings:
+        with st.expander(f"ℹ️ {len(monitor.config.warnings)} warning(s) in servers.yml - entries are kept"):
+            for warning in monitor.config.warnings:
+                st.write(f"- {warning}")
+
+    # Data comes from the background collector - page renders never SSH
+    if COLLECTOR_MODE == 'external':
+        collector = None
+        store = get_external_store()
+    else:
+        collector = get_collector()
+        store = collector.store
 
     # Sidebar controls
     with st.sidebar:
@@ -264,138 +689,31 @@ def main():
         refresh_interval = st.slider("Refresh Interval (seconds)", 30, 300, 60)
 
         if st.button("🔄 Refresh Now"):
-            st.session_state.last_refresh = time.time()
+            if collector is not None:
+                collector.request_refresh()
             st.rerun()
 
-        # Show last refresh time
-        time_since_refresh = int(time.time() - st.session_state.last_refresh)
-        st.info(f"⏱️ Last refresh: {time_since_refresh}s ago")
+        if collector is not None and collector.scheduler is not None:
+            intervals = collector.scheduler.intervals().values()
+            if intervals:
+                st.caption(f"🧭 Adaptive polling: every {min(intervals):.0f}-{max(intervals):.0f}s per host")
+
+        open_circuits = get_breakers().open_circuits()
+        if open_circuits:
+            st.caption(f"⚡ Fast-failing {len(open_circuits)} unreachable host(s): "
+                       + ", ".join(breaker.host for breaker in open_circuits))
 
         if auto_refresh:
             st.success(f"✅ Auto-refresh enabled ({refresh_interval}s)")
 
-    # Smart auto-refresh using st.empty() and time-based trigger
-    # This avoids blocking the UI with time.sleep()
-    if auto_refresh:
-        time_since_refresh = time.time() - st.session_state.last_refresh
-        if time_since_refresh >= refresh_interval:
-            st.session_state.last_refresh = time.time()
-            st.rerun()
-        else:
-            # Use st.empty() with JavaScript to trigger refresh
-            # This creates a non-blocking timer
-            time_to_next_refresh = int(refresh_interval - time_since_refresh)
-            st.sidebar.markdown(f"⏳ Next refresh in: **{time_to_next_refresh}s**")
-
-            # JavaScript-based auto-refresh (non-blocking)
-            refresh_script = f"""
-                <script>
-                    setTimeout(function() {{
-                        window.parent.location.reload();
-                    }}, {time_to_next_refresh * 1000});
-                </script>
-            """
-            st.components.v1.html(refresh_script, height=0)
-    
-    # Collect data from all servers concurrently
-    with st.spinner("Collecting data from servers..."):
-        all_data = []
-
-        # Limit concurrent connections to avoid Paramiko race conditions
-        max_parallel = min(6, len(monitor.servers))
-
-        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
-            future_to_server = {
-                executor.submit(monitor.collect_all_data, server): server 
-                for server in monitor.servers
-            }
-            
-            for future in as_completed(future_to_server):
-                data = future.result()
-                all_data.append(data)
-    
-    # Server status overview
-    st.header("📊 Server Status Overview")
+        # Narrow the page to host groups / tags from servers.yml
+        groups = st.multiselect("Groups", list(monitor.config.groups())) if monitor.config.groups() else None
+        tags = st.multiselect("Tags", monitor.config.tags()) if monitor.config.tags() else None
 
-    # Use grid layout - max 4 columns per row for better readability
-    servers_per_row = min(4, len(all_data))
-
-    # Create rows of server cards
-    for row_start in range(0, len(all_data), servers_per_row):
-        row_data = all_data[row_start:row_start + servers_per_row]
-        cols = st.columns(len(row_data))
-
-        for i, data in enumerate(row_data):
-            with cols[i]:
-                status_color = "green" if "🟢" in data['status'] else "red"
-                st.markdown(
-                    f"""
-                    <div style="border: 2px solid {status_color}; border-radius: 10px; padding: 10px; margin: 5px;">
-                        <h4>{data['server']}</h4>
-                        <p><strong>Status:</strong> {data['status']}</p>
-                        <p><strong>Host:</strong> {data['host']}</p>
-                        <p><strong>Updated:</strong> {data['last_updated']}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-    
-    # Detailed information for each server
-    for data in all_data:
-        st.header(f"🖥️ {data['server']} ({data['host']})")
-        
-        if "🔴" in data['status']:
-            st.error(f"Server is offline or unreachable: {data['status']}")
-            continue
-        
-        # Create tabs for different metrics
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "💽 Disk Usage", 
-            "🧠 Memory", 
-            "🎮 GPU (NVIDIA)", 
-            "🐳 Docker", 
-            "📈 System Info"
-        ])
-        
-        with tab1:
-            st.subheader("Disk Usage")
-            if data['disk']:
-                st.code(data['disk'], language='bash')
-            else:
-                st.info("No disk information available")
-        
-        with tab2:
-            st.subheader("Memory Usage")
-            if data['memory']:
-                st.code(data['memory'], language='bash')
-            else:
-                st.info("No memory information available")
-        
-        with tab3:
-            st.subheader("NVIDIA GPU Information")
-            if data['nvidia'] and "command not found" not in data['nvidia']:
-                st.code(data['nvidia'], language='bash')
-            else:
-                st.info("NVIDIA drivers not installed or nvidia-smi not available")
-        
-        with tab4:
-            st.subheader("Docker Containers")
-            if data['docker'] and "Cannot connect" not in data['docker']:
-                st.code(data['docker'], language='bash')
-            else:
-                st.info("Docker not running or not accessible")
-        
-        with tab5:
-            st.subheader("System Information")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.write("**Uptime:**")
-                st.code(data['uptime'])
-            with col2:
-                st.write("**CPU Usage:**")
-                st.code(data['cpu'])
-        
-        st.markdown("---")
+    # Auto-refresh reruns only the data fragment on a timer over the existing
+    # session - no page reload, login check or servers.yml re-read
+    dashboard = st.fragment(render_dashboard, run_every=refresh_interval if auto_refresh else None)
+    dashboard(store, collector, monitor.config.select(groups, tags))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+"""
+Async Collection Engine
+Collects from hundreds of servers concurrently on one asyncio event loop (asyncssh)
+
+Select with COLLECTION_ENGINE=async. Exposes the same collect_all_data /
+collect_many API as ServerMonitor.
+"""
+
+import asyncio
+import threading
+import time
+
+import asyncssh
+
+from circuit import get_breakers
+from config import ServerConfig
+from ingest import is_agent_host
+from parsers import parse_metrics
+from probe import (COMMANDS, FALLBACK_CHANNELS, ProbeError, build_probe_script, format_section,
+                   new_host_data, parse_probe_output, probe_command, set_status)
+from ssh_keys import asyncssh_client_factory, get_key_cache, get_known_hosts
+from ssh_pool import SSHConnectionPool
+
+
+class AsyncServerMonitor:
+    """asyncssh-based monitor with a global concurrency limit and per-host timeouts
+
+    The event loop runs in a daemon thread so connections stay open between
+    sweeps, like the paramiko connection pool.
+    """
+
+    def __init__(self, servers, max_concurrency=200, host_timeout=20,
+                 connect_timeout=8, precheck_timeout=1.5, probe_timeout=15, use_probe=True,
+                 keepalive_interval=30):
+        # A list of server dicts, or a ServerConfig to follow servers.yml changes
+        self._servers = servers
+        self.max_concurrency = max_concurrency
+        self.host_timeout = host_timeout
+        self.connect_timeout = connect_timeout
+        self.precheck_timeout = precheck_timeout
+        self.probe_timeout = probe_timeout
+        self.use_probe = use_probe
+        self.keepalive_interval = keepalive_interval
+
+        self._connections = {}
+        self._connect_locks = {}
+        self._semaphore = None
+        self.breakers = get_breakers()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-collector', daemon=True)
+        self._thread.start()
+
+    @property
+    def servers(self):
+        return self._servers.servers if isinstance(self._servers, ServerConfig) else self._servers
+
+    async def _get_connection(self, server):
+        key = SSHConnectionPool.make_key(server)
+        lock = self._connect_locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            conn = self._connections.get(key)
+            if conn is not None and not conn.is_closed():
+                return conn
+
+            host, port, username, key_file = key
+
+            # Cheap TCP check first so dead hosts fail fast
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.precheck_timeout)
+            writer.close()
+
+            known_hosts = get_known_hosts()
+            pinning = known_hosts.policy != 'off'
+            conn = await asyncssh.connect(
+                host,
+                port=port,
+                username=username,
+                client_keys=[get_key_cache().asyncssh_key(key_file)] if key_file else None,
+                # Same pinned known_hosts store as the paramiko pool
+                known_hosts=known_hosts.asyncssh_known_hosts if pinning else None,
+                client_factory=asyncssh_client_factory(known_hosts, host, port) if pinning else None,
+                agent_path=None,  # Don't use SSH agent (avoids hangs)
+                connect_timeout=self.connect_timeout,
+                keepalive_interval=self.keepalive_interval
+            )
+            self._connections[key] = conn
+            return conn
+
+    async def _run(self, conn, command, timeout):
+        result = await conn.run(command, check=False, timeout=timeout)
+        exit_status = result.exit_status if result.exit_status is not None else -1
+        return str(result.stdout or ''), str(result.stderr or ''), exit_status
+
+    async def _run_probe(self, conn):
+        script, nonce = build_probe_script(COMMANDS)
+        output, _, _ = await self._run(conn, probe_command(script), self.probe_timeout)
+        return parse_probe_output(output, nonce, COMMANDS)
+
+    async def _run_commands(self, conn, data):
+        channels = asyncio.Semaphore(FALLBACK_CHANNELS)
+
+        async def run_one(key, command):
+            try:
+                async with channels:
+                    return key, await self._run(conn, command, 5)
+            except Exception as cmd_error:
+                data[key] = f"Error: {str(cmd_error)}"
+                return key, None
+
+        # Channels on one connection run in parallel, up to FALLBACK_CHANNELS at once
+        results = await asyncio.gather(*(run_one(key, command) for key, command in COMMANDS.items()))
+        return {key: result for key, result in results if result is not None}
+
+    async def _collect(self, server, breaker):
+        data = new_host_data(server)
+        try:
+            try:
+                conn = await self._get_connection(server)
+            except Exception as e:
+                breaker.record_failure(str(e) or type(e).__name__)
+                raise
+            breaker.record_success()
+
+            sections = None
+            if self.use_probe and server.get('probe', True):
+                try:
+                    sections = await self._run_probe(conn)
+                    data['collection_mode'] = 'probe'
+                except (ProbeError, asyncssh.Error, asyncio.TimeoutError):
+                    sections = None  # Fall back to one command per channel
+
+            if sections is None:
+                sections = await self._run_commands(conn, data)
+                data['collection_mode'] = 'commands'
+
+            for key, (output, error_output, _) in sections.items():
+                data[key] = format_section(output, error_output)
+
+            set_status(data)
+            data['metrics'] = parse_metrics(data)
+            breaker.remember(data)
+
+        except Exception as e:
+            data['status'] = f'🔴 Error: {str(e) or type(e).__name__}'
+            data['uptime'] = f"Connection Error: {str(e) or type(e).__name__}"
+
+        return data
+
+    async def _collect_limited(self, server):
+        # Hosts with an open circuit return cached offline data without taking a slot
+        breaker = self.breakers.get(server)
+        if not breaker.allow_request():
+            return breaker.offline_data(server)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                data = await asyncio.wait_for(self._collect(server, breaker), self.host_timeout)
+            except asyncio.TimeoutError:
+                breaker.record_failure(f"timed out after {self.host_timeout}s")
+                self._drop_connection(server)
+                data = new_host_data(server)
+                data['status'] = f'🔴 Error: timed out after {self.host_timeout}s'
+                data['uptime'] = f"Connection Error: timed out after {self.host_timeout}s"
+            data['collect_seconds'] = round(time.monotonic() - started, 3)
+            return data
+
+    def _drop_connection(self, server):
+        conn = self._connections.pop(SSHConnectionPool.make_key(server), None)
+        if conn is not None:
+            conn.close()
+
+    async def _collect_many(self, servers, on_result):
+        all_data = []
+        tasks = [asyncio.ensure_future(self._collect_limited(server)) for server in servers]
+        for task in asyncio.as_completed(tasks):
+            data = await task
+            all_data.append(data)
+            if on_result is not None:
+                on_result(data)
+        return all_data
+
+    def collect_all_data(self, server):
+        """Collect all monitoring data for one server (blocking)"""
+        return asyncio.run_coroutine_threadsafe(self._collect_limited(server), self._loop).result()
+
+    def collect_many(self, servers=None, on_result=None):
+        """Collect from many servers concurrently on the event loop
+
+        Calls on_result(data) as each server finishes and returns all results.
+        """
+        servers = self.servers if servers is None else servers
+        servers = [server for server in servers if not is_agent_host(server)]
+        if not servers:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._collect_many(servers, on_result), self._loop)
+        return future.result()
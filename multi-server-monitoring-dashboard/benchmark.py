@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Collection Benchmark
+Runs the collection engines against a local fleet of stand-in SSH servers
+
+The fake fleet runs in its own process (Paramiko server, one port per host)
+and answers the composite probe and the per-command fallback with canned
+output, so results are reproducible and don't depend on real servers. Each
+engine runs in a fresh process so CPU time and memory are its own.
+
+    python benchmark.py                                   # 20 hosts, both engines
+    python benchmark.py --hosts 200 --latency 50 --jitter 20 --sweeps 20
+    python benchmark.py --engines async --failure-rate 0.05 --output results.json
+
+Results are written as JSON (stdout or --output) for tracking across versions.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import paramiko
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from probe import COMMANDS
+
+# Canned command output, keyed like probe.COMMANDS
+FIXTURES = {
+    'uptime': ' 10:15:01 up 42 days,  3:07,  1 user,  load average: 2.15, 1.98, 1.87',
+    'cpu': '%Cpu(s): 12.5 us,  3.1 sy,  0.0 ni, 83.9 id,  0.3 wa,  0.0 hi,  0.2 si,  0.0 st',
+    'disk': '\n'.join([
+        'Filesystem      Size  Used Avail Use% Mounted on',
+        '/dev/nvme0n1p2  1.8T  1.1T  640G  63% /',
+        '/dev/nvme1n1    3.6T  2.9T  700G  81% /models',
+        'tmpfs            63G     0   63G   0% /dev/shm',
+    ]),
+    'memory': '\n'.join([
+        '               total        used        free      shared  buff/cache   available',
+        'Mem:           251Gi        97Gi        12Gi       1.2Gi       142Gi       151Gi',
+        'Swap:          8.0Gi       512Mi       7.5Gi',
+    ]),
+    'nvidia': '\n'.join([
+        '+-----------------------------------------------------------------------------------------+',
+        '| NVIDIA-SMI 550.54.15              Driver Version: 550.54.15      CUDA Version: 12.4     |',
+        '|   0  NVIDIA A100-SXM4-80GB          On  |   00000000:07:00.0 Off |                    0 |',
+        '| N/A   41C    P0             212W /  400W |   61440MiB /  81920MiB |     57%      Default |',
+        '|   1  NVIDIA A100-SXM4-80GB          On  |   00000000:0F:00.0 Off |                    0 |',
+        '| N/A   38C    P0              98W /  400W |   20480MiB /  81920MiB |     12%      Default |',
+        '+-----------------------------------------------------------------------------------------+',
+    ]),
+    'docker': '\n'.join([
+        'CONTAINER ID   IMAGE                      COMMAND                  STATUS       NAMES',
+        '3f2a9c1b7d4e   ollama/ollama:latest       "/bin/ollama serve"      Up 3 days    ollama',
+        '9b8c7d6e5f4a   vllm/vllm-openai:latest    "python3 -m vllm.ent…"   Up 3 days    vllm-qwen',
+    ]),
+    'meminfo': '\n'.join([
+        'MemTotal:       263921232 kB',
+        'MemFree:        12582912 kB',
+        'MemAvailable:   158334976 kB',
+        'SwapTotal:      8388604 kB',
+        'SwapFree:       7864316 kB',
+    ]),
+    'disk_bytes': '\n'.join([
+        'Filesystem        1-blocks          Used     Available Capacity Mounted on',
+        '/dev/nvme0n1p2 1967317549056 1209462398976 687194767360      64% /',
+        '/dev/nvme1n1   3958241427456 3188646694912 769594732544      81% /models',
+    ]),
+    'gpu_query': '0, NVIDIA A100-SXM4-80GB, 57, 61440, 81920, 41, 212.30\n'
+                 '1, NVIDIA A100-SXM4-80GB, 12, 20480, 81920, 38, 98.10',
+    'containers': '3f2a9c1b7d4e\tollama/ollama:latest\tollama\tUp 3 days\n'
+                  '9b8c7d6e5f4a\tvllm/vllm-openai:latest\tvllm-qwen\tUp 3 days',
+    'gpu_apps': '\n'.join([
+        'gpu\t0\tGPU-0a1b2c3d',
+        'gpu\t1\tGPU-4e5f6a7b',
+        'app\t4242\tGPU-0a1b2c3d\t61000\tpython3\t' + '9b8c7d6e5f4a' * 5 + '1234'
+        + '\tpython3 -m vllm.entrypoints.openai.api_server --model Qwen/Qwen2.5-32B-Instruct\t',
+        'app\t5151\tGPU-4e5f6a7b\t20000\t/usr/bin/ollama\t' + '3f2a9c1b7d4e' * 5 + '1234'
+        + '\t/usr/bin/ollama runner --model /root/.ollama/models/blobs/sha256-6a0746a1\t/bin/ollama serve',
+    ]),
+    'ollama_ps': json.dumps({'models': [{'name': 'llama3.1:8b', 'size_vram': 20 * 1024 ** 3}]}),
+}
+
+
+def padded_fixtures(output_kb):
+    """FIXTURES with extra container lines so each probe returns about ``output_kb`` KiB more"""
+    fixtures = dict(FIXTURES)
+    extra_docker, extra_containers = [], []
+    size = 0
+    index = 0
+    while size < output_kb * 1024:
+        container_id = f"{index:012x}"
+        docker_line = f"{container_id}   worker/image:{index}   \"/entrypoint.sh\"   Up 2 hours   worker-{index}"
+        container_line = f"{container_id}\tworker/image:{index}\tworker-{index}\tUp 2 hours"
+        extra_docker.append(docker_line)
+        extra_containers.append(container_line)
+        size += len(docker_line) + len(container_line) + 2
+        index += 1
+    if extra_docker:
+        fixtures['docker'] += '\n' + '\n'.join(extra_docker)
+        fixtures['containers'] += '\n' + '\n'.join(extra_containers)
+    return fixtures
+
+
+# ---------------------------------------------------------------------------
+# Fake fleet (runs in its own process)
+# ---------------------------------------------------------------------------
+
+PROBE_SECTION = re.compile(r"@@([0-9a-f]{32}) BEGIN (\w+)@@")
+
+
+class FakeHost(paramiko.ServerInterface):
+    """Accepts any public key and answers exec requests with canned output"""
+
+    def __init__(self, fleet, transport):
+        self.fleet = fleet
+        self.transport = transport
+
+    def check_auth_publickey(self, username, key):
+        self.fleet.delay()  # Stands in for the auth round trips
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'publickey'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.fleet.respond, args=(self.transport, channel, command.decode()),
+                         daemon=True).start()
+        return True
+
+
+class FakeFleet:
+    """``hosts`` listening Paramiko servers with simulated latency, jitter and failures"""
+
+    def __init__(self, hosts, latency=0.0, jitter=0.0, failure_rate=0.0, down=0.0, output_kb=0, seed=0):
+        self.hosts = hosts
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.down = down
+        self.fixtures = padded_fixtures(output_kb)
+        self.commands = {command: key for key, command in COMMANDS.items()}
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            seconds = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def fails(self):
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def output_for(self, command):
+        """(stdout, exit status) for a probe script or a single monitoring command"""
+        sections = PROBE_SECTION.findall(command)
+        if sections:
+            nonce = sections[0][0]
+            lines = []
+            for _, key in sections:
+                lines += [f"@@{nonce} BEGIN {key}@@", self.fixtures.get(key, ''),
+                          f"@@{nonce} STDERR {key}@@", f"@@{nonce} END {key} 0@@"]
+            lines.append(f"@@{nonce} DONE@@")
+            return '\n'.join(lines) + '\n', 0
+        key = self.commands.get(command)
+        if key is None:
+            return '', 127
+        return self.fixtures[key] + '\n', 0
+
+    def respond(self, transport, channel, command):
+        self.delay()
+        if self.fails():
+            transport.close()  # Dropped connection, as seen when a host falls over mid-collection
+            return
+        output, status = self.output_for(command)
+        try:
+            channel.sendall(output.encode('utf-8'))
+            channel.send_exit_status(status)
+        except (OSError, EOFError):
+            pass  # The client gave up (timeout) or its connection was dropped
+        finally:
+            channel.close()
+
+    def _serve_connection(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        try:
+            transport.start_server(server=FakeHost(self, transport))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()  # TCP pre-checks and aborted handshakes
+
+    def _accept(self, listener):
+        while True:
+            client, _ = listener.accept()
+            threading.Thread(target=self._serve_connection, args=(client,), daemon=True).start()
+
+    def start(self):
+        """Open the listeners and return one port per host (down hosts get a closed port)"""
+        ports = []
+        down = set(self._random.sample(range(self.hosts), int(round(self.hosts * self.down))))
+        for index in range(self.hosts):
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(('127.0.0.1', 0))
+            ports.append(listener.getsockname()[1])
+            if index in down:
+                listener.close()  # Connection refused, like a powered-off host
+                continue
+            listener.listen(128)
+            threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        return ports
+
+
+def _run_fleet(options, ports_out):
+    paramiko.util.get_logger('paramiko').setLevel('CRITICAL')
+    fleet = FakeFleet(**options)
+    ports_out.send(fleet.start())
+    while True:
+        time.sleep(3600)
+
+
+# ---------------------------------------------------------------------------
+# Engine runs (each in a fresh process)
+# ---------------------------------------------------------------------------
+
+def percentiles(values):
+    """p50/p95/p99 plus mean/min/max, with linear interpolation between ranks"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(pct):
+        position = (len(ordered) - 1) * pct / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    return {
+        'p50': round(rank(50), 4),
+        'p95': round(rank(95), 4),
+        'p99': round(rank(99), 4),
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'min': round(ordered[0], 4),
+        'max': round(ordered[-1], 4),
+    }
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _run_engine(engine, mode, config_file, sweeps, results_out):
+    os.environ['COLLECTION_ENGINE'] = engine
+    os.environ['COLLECTION_MODE'] = mode
+    # Fresh host keys every run, so pin them in the run's own known_hosts
+    os.environ['KNOWN_HOSTS_FILE'] = os.path.join(os.path.dirname(config_file), 'known_hosts')
+    paramiko.util.get_logger('paramiko').setLevel('CRITICAL')
+    logging.getLogger('asyncio').setLevel('CRITICAL')  # Writes to connections the fleet dropped
+    from app import create_monitor
+
+    monitor = create_monitor(config_file)
+    servers = monitor.servers
+    rss_before = _rss_mb()
+
+    sweep_seconds, host_seconds, offline = [], [], 0
+    cpu_started = time.process_time()
+    for sweep in range(sweeps):
+        started = time.perf_counter()
+        all_data = monitor.collect_many(servers)
+        sweep_seconds.append(time.perf_counter() - started)
+        if sweep == 0:
+            cpu_cold = time.process_time() - cpu_started
+        host_seconds += [data['collect_seconds'] for data in all_data if data.get('collect_seconds') is not None]
+        offline += sum(1 for data in all_data if '🔴' in data['status'])
+    cpu_seconds = time.process_time() - cpu_started
+
+    # The first sweep pays for every SSH handshake; later sweeps reuse pooled connections
+    warm = sweep_seconds[1:] or sweep_seconds
+    results_out.send({
+        'engine': engine,
+        'mode': mode,
+        'hosts': len(servers),
+        'sweeps': sweeps,
+        'cold_sweep_seconds': round(sweep_seconds[0], 4),
+        'sweep_seconds': percentiles(warm),
+        'host_seconds': percentiles(host_seconds),
+        'hosts_per_second': round(len(servers) * len(warm) / sum(warm), 1) if sum(warm) else None,
+        'cpu_seconds': round(cpu_seconds, 3),
+        'cpu_seconds_cold': round(cpu_cold, 3),
+        'cpu_ms_per_host': round(1000 * (cpu_seconds - cpu_cold) / (len(servers) * len(warm)), 3)
+        if sweeps > 1 else None,
+        'rss_mb': _rss_mb(),
+        'rss_growth_mb': round(_rss_mb() - rss_before, 1) if rss_before is not None else None,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'offline_results': offline,
+    })
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def write_config(path, ports, key_file):
+    """servers.yml for the fake fleet"""
+    lines = ['servers:']
+    for index, port in enumerate(ports):
+        lines += [f'  - name: "bench-{index:04d}"', '    host: "127.0.0.1"', '    username: "bench"',
+                  f'    port: {port}', f'    key_file: "{key_file}"']
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collection engines against a local fake SSH fleet")
+    parser.add_argument('--hosts', type=int, default=20)
+    parser.add_argument('--sweeps', type=int, default=10, help="Sweeps per engine (the first one is reported as cold)")
+    parser.add_argument('--engines', default='threads,async', help="Comma-separated: threads, async")
+    parser.add_argument('--mode', choices=('probe', 'commands'), default='probe')
+    parser.add_argument('--latency', type=float, default=20, help="Simulated per-request latency (ms)")
+    parser.add_argument('--jitter', type=float, default=5, help="Uniform ± jitter on the latency (ms)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of exec requests that drop the connection")
+    parser.add_argument('--down', type=float, default=0.0, help="Fraction of hosts that refuse connections")
+    parser.add_argument('--output-kb', type=int, default=0, help="Extra KiB of docker output per probe")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+    if args.sweeps < 1 or args.hosts < 1:
+        parser.error("--hosts and --sweeps must be at least 1")
+
+    fleet_options = {
+        'hosts': args.hosts,
+        'latency': args.latency / 1000,
+        'jitter': args.jitter / 1000,
+        'failure_rate': args.failure_rate,
+        'down': args.down,
+        'output_kb': args.output_kb,
+        'seed': args.seed,
+    }
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory(prefix='server-monitor-bench-') as workdir:
+        key_file = os.path.join(workdir, 'id_rsa')
+        paramiko.RSAKey.generate(2048).write_private_key_file(key_file)
+
+        receiver, sender = context.Pipe(duplex=False)
+        fleet = context.Process(target=_run_fleet, args=(fleet_options, sender), name='fake-fleet', daemon=True)
+        fleet.start()
+        sender.close()
+        ports = receiver.recv()
+        config_file = os.path.join(workdir, 'servers.yml')
+        write_config(config_file, ports, key_file)
+        print(f"🧪 Fake fleet: {args.hosts} hosts, {args.latency:.0f}±{args.jitter:.0f}ms latency, "
+              f"{args.failure_rate:.0%} failures, {args.down:.0%} down", file=sys.stderr)
+
+        results = []
+        try:
+            for engine in [engine.strip() for engine in args.engines.split(',') if engine.strip()]:
+                receiver, sender = context.Pipe(duplex=False)
+                worker = context.Process(target=_run_engine, args=(engine, args.mode, config_file, args.sweeps, sender),
+                                         name=f'bench-{engine}')
+                worker.start()
+                sender.close()  # So a crashed worker shows up as EOFError instead of a hang
+                result = receiver.recv()
+                worker.join()
+                results.append(result)
+                sweep = result['sweep_seconds']
+                print(f"  {engine:8s} cold {result['cold_sweep_seconds']:.2f}s | warm p50 {sweep['p50']:.3f}s "
+                      f"p95 {sweep['p95']:.3f}s p99 {sweep['p99']:.3f}s | {result['hosts_per_second']} hosts/s | "
+                      f"CPU {result['cpu_seconds']:.2f}s | RSS {result['rss_mb']} MB", file=sys.stderr)
+        finally:
+            fleet.terminate()
+
+    report = {
+        'benchmark': 'collection',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'paramiko': paramiko.__version__,
+        'fleet': {'hosts': args.hosts, 'latency_ms': args.latency, 'jitter_ms': args.jitter,
+                  'failure_rate': args.failure_rate, 'down': args.down, 'output_kb': args.output_kb,
+                  'seed': args.seed},
+        'mode': args.mode,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+        print(f"📄 Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
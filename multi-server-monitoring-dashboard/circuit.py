@@ -0,0 +1,161 @@
+"""
+Circuit Breakers
+Fast-fail for unreachable hosts so dead machines don't stall collection
+
+After ``failure_threshold`` consecutive connection failures a host's circuit
+opens: collection returns cached "offline since X" data instantly. Once the
+reset timeout expires a cheap TCP check runs in the background; if the port
+answers, the circuit goes half-open and a single collection tries SSH again
+while every other caller keeps getting the offline data until it resolves.
+"""
+
+import socket
+import threading
+import time
+
+from probe import new_host_data
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def tcp_precheck(host, port, timeout=1.5):
+    """Raise OSError quickly if nothing accepts TCP connections on host:port"""
+    with socket.create_connection((host, port), timeout=timeout):
+        pass
+
+
+class CircuitBreaker:
+    """Per-host circuit state"""
+
+    def __init__(self, host, port, failure_threshold=2, reset_timeout=30, max_reset_timeout=300,
+                 precheck_timeout=1.5):
+        self.host = host
+        self.port = port
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.precheck_timeout = precheck_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.offline_since = None
+        self.opened_at = None
+        self.last_error = ''
+        self.last_data = None  # Last successful collection, served while offline
+        self._trial_running = False
+        self._half_open_trial = False  # A half-open request has been let through
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """True if collection should go ahead; False to serve offline data instead"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                # Only one trial request; the rest stay short-circuited until it records a result
+                if self._half_open_trial:
+                    return False
+                self._half_open_trial = True
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                threading.Thread(target=self._background_trial, name=f'circuit-{self.host}', daemon=True).start()
+            return False
+
+    def _background_trial(self):
+        try:
+            tcp_precheck(self.host, self.port, self.precheck_timeout)
+        except OSError as e:
+            with self._lock:
+                self._trial_running = False
+                self._reopen(f"TCP check failed: {e}")
+            return
+        with self._lock:
+            self._trial_running = False
+            self.state = HALF_OPEN
+            self._half_open_trial = False
+
+    def _reopen(self, error):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.last_error = error
+        self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._half_open_trial = False
+            self.failures = 0
+            self.offline_since = None
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.offline_since is None:
+                self.offline_since = time.time()
+            if self.state == HALF_OPEN:
+                self._half_open_trial = False
+                self._reopen(self.last_error)
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def remember(self, data):
+        """Keep a successful collection to serve while the host is offline"""
+        if '🟢' in data['status']:
+            self.last_data = data
+
+    def offline_data(self, server):
+        """Last known data for a host whose circuit is open, marked offline
+
+        Keeps the last collection's ``collected_at``, so age badges show how
+        old the metrics are.
+        """
+        data = dict(self.last_data) if self.last_data is not None else new_host_data(server)
+        data['server'] = server['name']  # Breakers are per host:port, which several entries may share
+        since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.offline_since or time.time()))
+        retry_in = max(0, self.reset_timeout - (time.time() - self.opened_at))
+        data['status'] = f'🔴 Offline since {since}'
+        data['uptime'] = f"Connection Error: {self.last_error} (circuit open, next check in {retry_in:.0f}s)"
+        data['collection_mode'] = 'circuit-open'
+        data['collect_seconds'] = 0.0
+        return data
+
+
+class BreakerRegistry:
+    """Process-wide circuit breakers keyed by (host, port)"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, server):
+        key = (server['host'], server.get('port', 22))
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(*key, **self.breaker_options)
+            return breaker
+
+    def open_circuits(self):
+        with self._lock:
+            return [breaker for breaker in self._breakers.values() if breaker.state == OPEN]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_breakers():
+    """Return the process-wide breaker registry (shared by all sessions and engines)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BreakerRegistry()
+        return _registry
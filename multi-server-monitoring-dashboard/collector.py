@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Background Collector
+Polls all servers on a schedule and publishes snapshots to a shared store,
+so dashboard page loads never trigger SSH work themselves.
+
+Run standalone (writes SNAPSHOT_FILE for dashboards using COLLECTOR_MODE=external):
+    python collector.py
+    python collector.py --shards 4          # 4 worker processes, one inventory shard each
+    python collector.py --shard 2 --shards 4  # just shard 2 of 4 (e.g. on another machine)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+from circuit import OPEN
+from ingest import is_agent_host
+from parsers import gpu_process_changes
+
+# Shortest pause between sweeps, so a sweep that keeps failing can't spin the collector thread
+MIN_SWEEP_WAIT = 1.0
+
+
+class SnapshotStore:
+    """Thread-safe holder for the latest per-host monitoring data
+
+    With ``path`` set the snapshot is also mirrored to a JSON file (written
+    atomically), which lets a collector in another process feed dashboards.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._hosts = {}
+        self._meta = {'sweep_started': None, 'sweep_finished': None, 'sweep_seconds': None, 'stats': {}}
+        self._version = 0
+        self._file_mtime = None
+        self._writer = False
+        self._cond = threading.Condition()
+
+    def publish_host(self, data):
+        """Store the latest data for one host, stamping when it was collected"""
+        data.setdefault('collected_at', time.time())
+        with self._cond:
+            self._writer = True
+            self._hosts[data['server']] = data
+            # Per-host counters for the Prometheus exporter
+            stats = self._meta['stats'].setdefault(data['server'], {'collections': 0, 'failures': 0})
+            stats['collections'] += 1
+            if '🔴' in data['status']:
+                stats['failures'] += 1
+            self._version += 1
+            self._cond.notify_all()
+
+    def host(self, name):
+        """Latest data for one host, or None"""
+        with self._cond:
+            return self._hosts.get(name)
+
+    def begin_sweep(self):
+        with self._cond:
+            self._writer = True
+            self._meta['sweep_started'] = time.time()
+
+    def end_sweep(self):
+        with self._cond:
+            self._meta['sweep_finished'] = time.time()
+            self._meta['sweep_seconds'] = self._meta['sweep_finished'] - self._meta['sweep_started']
+            self._version += 1
+            self._cond.notify_all()
+        if self.path:
+            self.save()
+
+    def latest(self):
+        """Return a copy of the latest snapshot"""
+        if self.path and not self._writer:
+            # Reader side of external mode: reload only when the file changed
+            self.load()
+        with self._cond:
+            return {
+                'hosts': dict(self._hosts),
+                'version': self._version,
+                **self._meta,
+                'stats': {name: dict(counts) for name, counts in (self._meta['stats'] or {}).items()}
+            }
+
+    def wait_for_update(self, version, timeout):
+        """Block until the snapshot is newer than ``version`` or timeout expires"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._version <= version:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._version
+
+    def save(self):
+        with self._cond:
+            payload = {'hosts': self._hosts, **self._meta}
+            text = json.dumps(payload)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write(text)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._file_mtime:
+            return
+        try:
+            with open(self.path, 'r') as file:
+                payload = json.load(file)
+        except (OSError, ValueError):
+            return  # Partially written or unreadable - keep the previous snapshot
+        with self._cond:
+            self._hosts = payload.get('hosts', {})
+            self._meta = {key: payload.get(key) for key in self._meta}
+            self._version += 1
+            self._file_mtime = mtime
+            self._cond.notify_all()
+
+
+class Collector:
+    """Polls servers in a daemon thread
+
+    Without a scheduler every server is polled each ``interval``; with an
+    AdaptiveScheduler each host is polled when its own interval is due.
+    Hosts with ``mode: agent`` are never polled - their pushes arrive via
+    the AgentReceiver passed as ``agents``. With a sharding.HashRing as
+    ``ring`` only the hosts owned by ``shard`` are polled.
+    """
+
+    def __init__(self, monitor, store, interval=60, history=None, scheduler=None, agents=None,
+                 ring=None, shard=0):
+        self.monitor = monitor
+        self.store = store
+        self.interval = interval
+        self.history = history
+        self.scheduler = scheduler
+        self.agents = agents
+        self.ring = ring
+        self.shard = shard
+        self._requested = set()  # Host names queued for an on-demand refresh
+        self._in_flight = set()  # Host names currently being collected
+        self._queue_lock = threading.Lock()
+        self._refresh = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def polled_servers(self):
+        """Servers collected over SSH (by this shard)"""
+        servers = [server for server in self.monitor.servers if not is_agent_host(server)]
+        return servers if self.ring is None else self.ring.servers_for(servers, self.shard)
+
+    def sweep(self, servers=None):
+        """Collect from the given servers (default: all polled), publishing each host as it finishes"""
+        servers = self.polled_servers if servers is None else servers
+        if not servers:
+            return
+        with self._queue_lock:
+            self._in_flight.update(server['name'] for server in servers)
+
+        def publish(data):
+            self.publish(data)
+            with self._queue_lock:
+                self._in_flight.discard(data['server'])
+
+        self.store.begin_sweep()
+        try:
+            all_data = self.monitor.collect_many(servers, on_result=publish)
+        except Exception:
+            # No results to adapt from - back the hosts off so they aren't due again immediately
+            if self.scheduler is not None:
+                for server in servers:
+                    self.scheduler.record_failure(server)
+            raise
+        finally:
+            with self._queue_lock:
+                self._in_flight.difference_update(server['name'] for server in servers)
+        self.store.end_sweep()
+
+        if self.scheduler is not None:
+            servers_by_name = {server['name']: server for server in servers}
+            for data in all_data:
+                self.scheduler.record(servers_by_name[data['server']], data)
+
+        if self.history is not None:
+            self.history.record(all_data)
+
+    def publish(self, data):
+        """Store one host's data along with its GPU process changes since the previous snapshot"""
+        previous = self.store.host(data['server'])
+        current = (data.get('metrics') or {}).get('gpu_processes')
+        if current is not None:
+            before = ((previous or {}).get('metrics') or {}).get('gpu_processes')
+            # The first snapshot (or the first after a failure) has nothing to diff against
+            data['gpu_changes'] = gpu_process_changes(before, current) if before is not None else []
+        self.store.publish_host(data)
+
+    def ingest(self, data):
+        """Publish data pushed by an agent host"""
+        self.publish(data)
+        if self.history is not None:
+            self.history.record([data])
+
+    def run(self):
+        if self.agents is not None:
+            self.agents.start(self.ingest)
+
+        while not self._stop.is_set():
+            with self._queue_lock:
+                requested, self._requested = self._requested, set()
+            try:
+                if requested:
+                    self.sweep([server for server in self.polled_servers if server['name'] in requested])
+                elif self.scheduler is None:
+                    self.sweep()
+                else:
+                    self.sweep(self.scheduler.due(self.polled_servers))
+            except Exception as e:
+                print(f"Collector sweep failed: {e}")
+
+            if self.agents is not None:
+                self.agents.update_servers([server for server in self.monitor.servers if is_agent_host(server)])
+                self.agents.expire_stale()
+                if self.store.path:
+                    self.store.save()  # Agent pushes reach external dashboards once per interval
+
+            if self.scheduler is None:
+                wait = self.interval
+            else:
+                wait = min(self.interval, self.scheduler.seconds_until_next(self.polled_servers))
+            if self._refresh.wait(max(MIN_SWEEP_WAIT, wait)):
+                self._refresh.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            # The first sweep is about to collect every polled host - let pages wait for them
+            with self._queue_lock:
+                self._in_flight.update(server['name'] for server in self.polled_servers)
+            self._thread = threading.Thread(target=self.run, name='collector', daemon=True)
+            self._thread.start()
+        return self
+
+    def request_refresh(self, names=None):
+        """Queue hosts (default: all polled) for collection now instead of at their interval
+
+        Hosts already being collected are skipped, so concurrent refreshes of
+        the same host collapse into the one in-flight request. Returns the
+        number of hosts queued.
+        """
+        if names is None:
+            names = [server['name'] for server in self.polled_servers]
+        with self._queue_lock:
+            queued = set(names) - self._in_flight - self._requested
+            self._requested.update(queued)
+        if queued:
+            self._refresh.set()
+        return len(queued)
+
+    def pending(self, names):
+        """The hosts among ``names`` that are being collected or queued right now"""
+        with self._queue_lock:
+            return [name for name in names if name in self._in_flight or name in self._requested]
+
+    def revalidate(self, ttl):
+        """Queue a background refresh for polled hosts whose data is older than ``ttl`` seconds
+
+        Callers keep serving the cached snapshot; fresh data is published as it
+        arrives. Hosts the adaptive scheduler isn't due to poll yet (including
+        unreachable ones it is backing off) and hosts with an open circuit are
+        left to their own schedule, so open pages don't add SSH load.
+        """
+        hosts = self.store.latest()['hosts']
+        now = time.time()
+        stale = [
+            server for server in self.polled_servers
+            if server['name'] in hosts and now - hosts[server['name']].get('collected_at', 0) > ttl
+        ]
+        if self.scheduler is not None:
+            stale = self.scheduler.due(stale, now)
+        breakers = getattr(self.monitor, 'breakers', None)
+        if breakers is not None:
+            stale = [server for server in stale if breakers.get(server).state != OPEN]
+        return self.request_refresh([server['name'] for server in stale]) if stale else 0
+
+    def stop(self):
+        self._stop.set()
+        self._refresh.set()
+
+
+def run_collector(shard=0, shards=1):
+    """Run one collector (or one shard of a sharded collector) in this process"""
+    from app import (COLLECTOR_INTERVAL, METRICS_PORT, SNAPSHOT_FILE, create_agent_receiver,
+                     create_history, create_monitor, create_scheduler)
+    from exporter import MetricsExporter
+    from sharding import HashRing, shard_path
+
+    monitor = create_monitor()
+    if not monitor.servers:
+        print("❌ No servers configured in servers.yml")
+        return
+
+    ring = HashRing(shards) if shards > 1 else None
+    snapshot_file = shard_path(SNAPSHOT_FILE, shard) if ring else SNAPSHOT_FILE
+    # Only one process can own the agent endpoint
+    agents = create_agent_receiver(monitor) if shard == 0 else None
+    scheduler = create_scheduler()
+    collector = Collector(monitor, SnapshotStore(snapshot_file), interval=COLLECTOR_INTERVAL,
+                          history=create_history(), scheduler=scheduler, agents=agents,
+                          ring=ring, shard=shard)
+
+    cadence = "adaptively" if scheduler else f"every {COLLECTOR_INTERVAL}s"
+    prefix = f"[shard {shard}/{shards}] " if ring else ""
+    print(f"📡 {prefix}Collecting from {len(collector.polled_servers)} servers {cadence} → {snapshot_file}")
+    if agents is not None:
+        endpoints = [f"http://0.0.0.0:{agents.port}/ingest" if agents.port else None, agents.socket_path]
+        print(f"📥 Accepting pushes from {len(agents.servers)} agent hosts on "
+              + ", ".join(endpoint for endpoint in endpoints if endpoint))
+
+    if METRICS_PORT and ring is None:
+        MetricsExporter(collector.store, port=METRICS_PORT).start()
+        print(f"📈 Prometheus metrics on http://0.0.0.0:{METRICS_PORT}/metrics")
+
+    try:
+        collector.run()
+    except KeyboardInterrupt:
+        print(f"\n{prefix}Collector stopped.")
+
+
+def run_sharded(shards):
+    """Run one collector process per shard and export the merged snapshot"""
+    from app import METRICS_PORT, SNAPSHOT_FILE
+    from exporter import MetricsExporter
+    from sharding import ShardedSnapshotStore
+
+    # Spawn rather than fork: the parent may already hold threads and sockets
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_collector, args=(shard, shards), name=f'collector-shard{shard}')
+               for shard in range(shards)]
+    for worker in workers:
+        worker.start()
+
+    if METRICS_PORT:
+        MetricsExporter(ShardedSnapshotStore(SNAPSHOT_FILE, shards), port=METRICS_PORT).start()
+        print(f"📈 Prometheus metrics for all {shards} shards on http://0.0.0.0:{METRICS_PORT}/metrics")
+
+    # `docker stop` sends SIGTERM - shut the workers down with the parent
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\nCollector stopped.")
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+def main():
+    from app import COLLECTOR_SHARDS
+
+    parser = argparse.ArgumentParser(description="Background collector for the monitoring dashboard")
+    parser.add_argument('--shards', type=int, default=COLLECTOR_SHARDS,
+                        help="Split the inventory across this many collector processes")
+    parser.add_argument('--shard', type=int, default=None,
+                        help="Run only this shard (0-based) of --shards, e.g. on another machine")
+    args = parser.parse_args()
+    if args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be between 0 and {args.shards - 1}")
+
+    if args.shard is not None:
+        run_collector(args.shard, args.shards)
+    elif args.shards > 1:
+        run_sharded(args.shards)
+    else:
+        run_collector()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Server Configuration
+Parses servers.yml once and re-reads it only when the file changes
+
+Servers can be listed at the top level or inside named groups. Group
+settings (username, key_file, port, tags, ...) are defaults for every server
+in the group:
+
+    groups:
+      gpu-nodes:
+        username: ubuntu
+        key_file: ~/.ssh/gpu_key
+        tags: [gpu, inference]
+        servers:
+          - name: "GPU 1"
+            host: 10.0.0.11
+    servers:
+      - name: "Gateway"
+        host: 10.0.0.2
+        username: admin
+        tags: [edge]
+"""
+
+import os
+import threading
+
+import yaml
+
+# Allowed per-server keys and their types
+SERVER_FIELDS = {
+    'name': str,
+    'host': str,
+    'username': str,
+    'port': int,
+    'key_file': str,
+    'probe': bool,
+    'priority': str,
+    'mode': str,
+    'group': str,
+    'tags': list,
+}
+PRIORITIES = ('high', 'normal', 'low')
+MODES = ('ssh', 'agent')
+
+# libyaml's C loader parses large inventories several times faster when available
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _validate_server(server, where):
+    """Check one server entry
+
+    Returns (server, errors, warnings). Only a missing or invalid name or
+    host rejects the entry (server is None). Unknown keys are kept, and an
+    optional value of the wrong type is dropped so its default applies;
+    both are reported as warnings.
+    """
+    if not isinstance(server, dict):
+        return None, [f"{where}: expected a mapping, got {type(server).__name__}"], []
+
+    server = dict(server)
+    errors, warnings = [], []
+    for key in ('name', 'host'):
+        value = server.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = server[key] = str(value)
+        if key not in server:
+            errors.append(f"{where}: missing required key '{key}'")
+        elif not isinstance(value, str) or not value.strip():
+            errors.append(f"{where}: '{key}' must be a non-empty string")
+    if errors:
+        return None, errors, warnings
+
+    port = server.get('port')
+    if isinstance(port, str) and port.strip().isdigit():
+        server['port'] = port = int(port)
+    if 'port' in server and not (isinstance(port, int) and not isinstance(port, bool) and 0 < port < 65536):
+        warnings.append(f"{where}: 'port' must be 1-65535, using 22")
+        del server['port']
+
+    for key in list(server):
+        expected = SERVER_FIELDS.get(key)
+        if expected is None:
+            warnings.append(f"{where}: unknown key '{key}' (ignored)")
+        elif not isinstance(server[key], expected) or (expected is int and isinstance(server[key], bool)):
+            warnings.append(f"{where}: '{key}' must be {expected.__name__}, using the default")
+            del server[key]
+
+    if server.get('priority', 'normal') not in PRIORITIES:
+        warnings.append(f"{where}: priority must be one of {', '.join(PRIORITIES)}, using normal")
+        del server['priority']
+    if server.get('mode', 'ssh') not in MODES:
+        warnings.append(f"{where}: mode must be one of {', '.join(MODES)}, using ssh")
+        del server['mode']
+    if server.get('mode') != 'agent' and 'username' not in server:
+        warnings.append(f"{where}: no 'username', connecting as the local user")
+    return server, errors, warnings
+
+
+def parse_config(document):
+    """Flatten and validate a parsed servers.yml document
+
+    Returns (servers, errors, warnings). Entries without a usable name or
+    host are left out (errors) so one typo doesn't take down the whole
+    inventory; anything else is reported as a warning and the entry kept.
+    """
+    if document is None:
+        document = {}
+    if not isinstance(document, dict):
+        return [], ["top level must be a mapping with 'servers' and/or 'groups'"], []
+
+    entries = [(server, f"servers[{index}]") for index, server in enumerate(document.get('servers') or [])]
+    errors = []
+    for group_name, group in (document.get('groups') or {}).items():
+        if not isinstance(group, dict):
+            errors.append(f"groups.{group_name}: expected a mapping")
+            continue
+        defaults = {key: value for key, value in group.items() if key != 'servers'}
+        for index, server in enumerate(group.get('servers') or []):
+            if isinstance(server, dict):
+                merged = {**defaults, **server, 'group': group_name}
+                group_tags, own_tags = defaults.get('tags') or [], server.get('tags') or []
+                if isinstance(group_tags, list) and isinstance(own_tags, list):
+                    merged['tags'] = group_tags + [tag for tag in own_tags if tag not in group_tags]
+                server = merged
+            entries.append((server, f"groups.{group_name}.servers[{index}]"))
+
+    servers, warnings = [], []
+    seen = set()
+    for server, where in entries:
+        server, problems, notes = _validate_server(server, where)
+        if server is not None and server['name'] in seen:
+            server, problems = None, [f"{where}: duplicate server name '{server['name']}'"]
+        errors += problems
+        warnings += notes
+        if server is not None:
+            seen.add(server['name'])
+            servers.append(server)
+    return servers, errors, warnings
+
+
+class ServerConfig:
+    """servers.yml cached by (inode, mtime, size) and reloaded when the file changes
+
+    If a changed file fails to parse, the last good server list is kept and
+    the problem is reported in ``errors``. Problems that didn't cost an
+    entry are in ``warnings``.
+    """
+
+    def __init__(self, path='servers.yml'):
+        self.path = path
+        self.version = 0
+        self.errors = []
+        self.warnings = []
+        self._servers = []
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """Re-read the file if it changed since the last load; returns True if it did"""
+        signature = self._stat_signature()
+        if signature == self._signature and self.version:
+            return False
+
+        with self._lock:
+            if signature == self._signature and self.version:
+                return False
+            if signature is None:
+                self._servers, self.errors, self.warnings = [], [f"Configuration file {self.path} not found!"], []
+            else:
+                try:
+                    with open(self.path, 'r') as file:
+                        self._servers, self.errors, self.warnings = parse_config(
+                            yaml.load(file, Loader=YAML_LOADER))
+                except (OSError, yaml.YAMLError) as e:
+                    # Keep serving the last good inventory while the file is being edited
+                    self.errors = [f"Could not parse {self.path}: {e}"]
+            self._signature = signature
+            self.version += 1
+            return True
+
+    @property
+    def servers(self):
+        self.load()
+        return self._servers
+
+    def groups(self):
+        """{group name: [server names]}"""
+        groups = {}
+        for server in self.servers:
+            if server.get('group'):
+                groups.setdefault(server['group'], []).append(server['name'])
+        return groups
+
+    def tags(self):
+        return sorted({tag for server in self.servers for tag in server.get('tags') or []})
+
+    def select(self, groups=None, tags=None):
+        """Servers in any of ``groups`` and carrying any of ``tags`` (None means no filter)"""
+        return [
+            server for server in self.servers
+            if (not groups or server.get('group') in groups)
+            and (not tags or set(tags) & set(server.get('tags') or []))
+        ]
+
+
+_configs = {}
+_configs_lock = threading.Lock()
+
+
+def get_config(path='servers.yml'):
+    """Return the process-wide ServerConfig for a file, creating it on first use"""
+    path = os.path.abspath(path)
+    with _configs_lock:
+        config = _configs.get(path)
+        if config is None:
+            config = _configs[path] = ServerConfig(path)
+        return config
@@ -1,98 +1,245 @@
 #!/usr/bin/env python3
 """
 Performance Debugging Script
-Tests SSH connection speed to each server
+Tests SSH connection speed to each server, phase by phase
+
+Every connection is broken down into DNS, TCP connect, SSH banner, key
+exchange, key load and auth, and every monitoring command into channel open,
+first byte and total time - so a slow network, slow crypto and a slow
+`nvidia-smi` look different.
+
+    python debug_performance.py                       # one server at a time
+    python debug_performance.py --parallel            # all servers at once, plus a real engine sweep
+    python debug_performance.py --csv phases.csv      # also write every timing as CSV
 """
 
-import paramiko
-import time
-import yaml
+import argparse
+import csv
+import getpass
 import os
-from datetime import datetime
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+
+from config import get_config
+from ingest import is_agent_host
+from probe import COMMANDS, build_probe_script, probe_command
+
+CONNECT_PHASES = ('dns', 'tcp', 'banner', 'kex', 'key_load', 'auth')
+COMMAND_PHASES = ('open', 'first_byte', 'total')
+CSV_COLUMNS = ('server', 'host', 'phase', 'command', 'seconds', 'bytes', 'error')
 
 def load_servers():
-    """Load servers from config"""
+    """Load SSH-polled servers from config"""
+    config = get_config('servers.yml')
+    for error in config.errors:
+        print(f"Error loading servers.yml: {error}")
+    for warning in config.warnings:
+        print(f"Warning in servers.yml: {warning}")
+    return [server for server in config.servers if not is_agent_host(server)]
+
+def time_connect(server, timings, timeout=10):
+    """Open an authenticated Transport, recording each phase in ``timings``"""
+    host, port = server['host'], server.get('port', 22)
+
+    start = time.perf_counter()
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    timings['dns'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sock = socket.socket(family, socktype, proto)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    timings['tcp'] = time.perf_counter() - start
+
+    # Wait for the server's identification string without consuming it
+    start = time.perf_counter()
+    sock.recv(1, socket.MSG_PEEK)
+    timings['banner'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transport = paramiko.Transport(sock)
+    transport.banner_timeout = timeout
+    transport.start_client(timeout=timeout)
+    timings['kex'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    key_file = server.get('key_file')
+    pkey = paramiko.PKey.from_path(os.path.expanduser(key_file)) if key_file else None
+    timings['key_load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if pkey is None:
+        transport.close()
+        raise paramiko.AuthenticationException("no key_file configured for this server")
+    transport.auth_publickey(server.get('username') or getpass.getuser(), pkey)
+    timings['auth'] = time.perf_counter() - start
+    return transport
+
+def time_command(transport, command, timeout=15):
+    """Run one command on a fresh channel: (open, first_byte, total, bytes)"""
+    start = time.perf_counter()
+    channel = transport.open_session(timeout=timeout)
+    opened = time.perf_counter() - start
+
+    channel.settimeout(timeout)
+    channel.set_combine_stderr(True)
+    channel.exec_command(command)
+    first_byte = None
+    size = 0
+    while True:
+        chunk = channel.recv(32768)
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        if not chunk:
+            break
+        size += len(chunk)
+    channel.recv_exit_status()
+    total = time.perf_counter() - start
+    channel.close()
+    return opened, first_byte, total, size
+
+def test_server_connection(server, verbose=True):
+    """Time every phase for one server; returns a list of CSV rows"""
+    say = print if verbose else (lambda *args: None)
+    say(f"\n{'='*70}")
+    say(f"Testing: {server['name']} ({server['host']})")
+    say(f"{'='*70}")
+
+    rows = []
+
+    def row(phase, seconds, command='', size='', error=''):
+        rows.append({'server': server['name'], 'host': server['host'], 'phase': phase, 'command': command,
+                     'seconds': round(seconds, 4) if seconds is not None else '', 'bytes': size, 'error': error})
+
+    start = time.perf_counter()
+    timings = {}
     try:
-        with open('servers.yml', 'r') as file:
-            config = yaml.safe_load(file)
-            return config.get('servers', [])
+        transport = time_connect(server, timings)
     except Exception as e:
-        print(f"Error loading servers.yml: {e}")
-        return []
+        for phase, seconds in timings.items():
+            row(phase, seconds)
+        failed_phase = CONNECT_PHASES[len(timings)] if len(timings) < len(CONNECT_PHASES) else 'connect'
+        row(failed_phase, time.perf_counter() - start - sum(timings.values()), error=str(e) or type(e).__name__)
+        row('connect_total', time.perf_counter() - start)
+        say(f"❌ Connection failed during {failed_phase}: {e}")
+        return rows
 
-def test_server_connection(server):
-    """Test connection speed to a single server"""
-    print(f"\n{'='*70}")
-    print(f"Testing: {server['name']} ({server['host']})")
-    print(f"{'='*70}")
+    for phase in CONNECT_PHASES:
+        row(phase, timings[phase])
+        say(f"  ├─ {phase:10s}: {timings[phase]*1000:8.1f}ms")
+    connect_time = sum(timings.values())
+    row('connect_total', connect_time)
+    say(f"✅ Connection established: {connect_time:.2f}s")
 
-    results = {}
+    # Every monitoring command on its own channel, then the composite probe the dashboard uses
+    script, _ = build_probe_script(COMMANDS)
+    commands = {**COMMANDS, 'probe': probe_command(script)}
+    say(f"  {'command':12s} {'open':>9s} {'1st byte':>9s} {'total':>9s} {'bytes':>8s}")
+    for name, command in commands.items():
+        try:
+            opened, first_byte, total, size = time_command(transport, command)
+        except Exception as e:
+            row('command_total', None, name, error=str(e) or type(e).__name__)
+            say(f"  ├─ {name:10s} Error: {e}")
+            continue
+        for phase, seconds in zip(COMMAND_PHASES, (opened, first_byte, total)):
+            row(f"command_{phase}", seconds, name, size if phase == 'total' else '')
+        say(f"  ├─ {name:10s} {opened*1000:7.1f}ms {first_byte*1000:7.1f}ms {total*1000:7.1f}ms {size:8d}")
 
-    # Test 1: Connection time
-    start = time.time()
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        key_file = server.get('key_file')
-        if key_file:
-            key_file = os.path.expanduser(key_file)
-
-        ssh.connect(
-            hostname=server['host'],
-            port=server.get('port', 22),
-            username=server['username'],
-            key_filename=key_file,
-            timeout=10
-        )
-
-        connect_time = time.time() - start
-        results['connect_time'] = connect_time
-        print(f"✅ Connection established: {connect_time:.2f}s")
-
-        # Test 2: Command execution time
-        commands = {
-            'uptime': 'uptime',
-            'cpu': "top -bn1 | grep 'Cpu(s)' | head -1",
-            'disk': 'df -h',
-            'memory': 'free -h',
-            'nvidia': 'nvidia-smi',
-            'docker': 'docker ps'
-        }
-
-        total_cmd_time = 0
-        for cmd_name, command in commands.items():
-            cmd_start = time.time()
-            try:
-                stdin, stdout, stderr = ssh.exec_command(command, timeout=5)
-                output = stdout.read().decode('utf-8')
-                cmd_time = time.time() - cmd_start
-                total_cmd_time += cmd_time
-                print(f"  ├─ {cmd_name:10s}: {cmd_time:.2f}s")
-            except Exception as e:
-                cmd_time = time.time() - cmd_start
-                print(f"  ├─ {cmd_name:10s}: {cmd_time:.2f}s (Error: {e})")
-
-        results['cmd_time'] = total_cmd_time
-
-        ssh.close()
-        close_time = time.time() - start
-        results['total_time'] = close_time
-
-        print(f"\n📊 Summary:")
-        print(f"  Connect: {connect_time:.2f}s")
-        print(f"  Commands: {total_cmd_time:.2f}s")
-        print(f"  Total: {close_time:.2f}s")
-
-        return results
+    transport.close()
+    row('server_total', time.perf_counter() - start)
+    return rows
 
-    except Exception as e:
-        error_time = time.time() - start
-        print(f"❌ Connection failed: {error_time:.2f}s")
-        print(f"   Error: {e}")
-        return {'error': str(e), 'total_time': error_time}
+def phase_table(rows):
+    """{server: {phase: seconds}} for the connect phases and per-server totals"""
+    table = {}
+    for r in rows:
+        if not r['command'] and r['seconds'] != '':
+            table.setdefault(r['server'], {})[r['phase']] = r['seconds']
+    return table
+
+def print_summary(rows, servers, wall_time, parallel):
+    table = phase_table(rows)
+    command_rows = [r for r in rows if r['phase'] == 'command_total' and r['seconds'] != '']
+    errors = [r for r in rows if r['error']]
+
+    print(f"\n{'#'*70}")
+    print(f"# OVERALL SUMMARY")
+    print(f"{'#'*70}")
+    print(f"\nTotal servers: {len(servers)}")
+    print(f"Total time ({'parallel' if parallel else 'sequential'}): {wall_time:.2f}s")
+
+    # Connect phases per server
+    print(f"\n{'server (ms)':20s} " + ' '.join(f"{phase:>9s}" for phase in CONNECT_PHASES) + f" {'total':>9s}")
+    for server in servers:
+        phases = table.get(server['name'], {})
+        cells = [f"{phases[phase]*1000:9.1f}" if phase in phases else f"{'-':>9s}"
+                 for phase in CONNECT_PHASES + ('server_total',)]
+        print(f"{server['name'][:20]:20s} " + ' '.join(cells))
+
+    # Slowest commands across the fleet
+    print(f"\n🐌 Slowest commands:")
+    for r in sorted(command_rows, key=lambda r: r['seconds'], reverse=True)[:5]:
+        print(f"  - {r['server']:20s} {r['command']:12s} {r['seconds']:.2f}s")
+
+    if errors:
+        print(f"\n❌ Errors: {len(errors)}")
+        for r in errors:
+            print(f"  - {r['server']} ({r['host']}) {r['phase']} {r['command']}: {r['error']}")
+
+    # Diagnosis - which phase dominates the average host?
+    connected = [phases for phases in table.values() if 'auth' in phases]
+    if not connected:
+        return
+    average = {phase: sum(phases[phase] for phases in connected) / len(connected) for phase in CONNECT_PHASES}
+    per_command = {}
+    for r in command_rows:
+        per_command.setdefault(r['command'], []).append(r['seconds'])
+    slowest_command, times = max(per_command.items(), key=lambda item: sum(item[1]) / len(item[1]),
+                                 default=('', [0]))
+    command_average = sum(times) / len(times)
+
+    print(f"\n🔍 DIAGNOSIS:")
+    network = average['tcp'] + average['banner']
+    crypto = average['kex'] + average['key_load'] + average['auth']
+    if average['dns'] > 0.5:
+        print(f"  ⚠️  SLOW DNS: {average['dns']:.2f}s per lookup - use IPs or fix the resolver")
+    if network > 1:
+        print(f"  ⚠️  SLOW NETWORK: TCP + banner take {network:.2f}s on average")
+        print(f"     A slow banner alone usually means reverse-DNS (UseDNS) on the server")
+    if crypto > 1:
+        print(f"  ⚠️  SLOW HANDSHAKE: kex + key load + auth take {crypto:.2f}s on average")
+        print(f"     Possible causes: large RSA keys, slow server CPU, encrypted key files")
+    if command_average > 2:
+        print(f"  ⚠️  SLOW COMMAND: '{slowest_command}' takes {command_average:.2f}s on average")
+    if max(network, crypto, command_average) <= 1 and average['dns'] <= 0.5:
+        print(f"  ✅ FAST: connect {network + crypto:.2f}s, slowest command '{slowest_command}' "
+              f"{command_average:.2f}s on average")
+
+def real_sweep(servers):
+    """Time the configured collection engine on the same servers (cold, then pooled)"""
+    from app import COLLECTION_ENGINE, create_monitor
+
+    monitor = create_monitor()
+    print(f"\n⚡ Real sweep with the {COLLECTION_ENGINE} engine:")
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        all_data = monitor.collect_many(servers)
+        elapsed = time.perf_counter() - start
+        online = sum(1 for data in all_data if '🟢' in data['status'])
+        print(f"  {label}: {elapsed:.2f}s ({online}/{len(servers)} online)")
 
 def main():
+    parser = argparse.ArgumentParser(description="Break SSH collection time down by phase for every server")
+    parser.add_argument('--parallel', action='store_true',
+                        help="Test all servers concurrently and time a real sweep of the configured engine")
+    parser.add_argument('--workers', type=int, default=6, help="Concurrent servers in --parallel mode")
+    parser.add_argument('--csv', help="Write every timing to this CSV file")
+    args = parser.parse_args()
+
     print(f"\n{'#'*70}")
     print(f"# Performance Debugging Tool")
     print(f"# Testing SSH connection speed to all servers")
@@ -106,71 +253,29 @@ def main():
 
     print(f"\n📋 Found {len(servers)} servers")
 
-    total_start = time.time()
-    all_results = []
-
-    for server in servers:
-        results = test_server_connection(server)
-        results['server'] = server['name']
-        results['host'] = server['host']
-        all_results.append(results)
+    total_start = time.perf_counter()
+    all_rows = []
+    if args.parallel:
+        # Per-host detail would interleave, so only the summary table is printed
+        print(f"⏱️  Testing {len(servers)} servers with {min(args.workers, len(servers))} workers...")
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(servers)))) as executor:
+            for rows in executor.map(lambda server: test_server_connection(server, verbose=False), servers):
+                all_rows += rows
+    else:
+        for server in servers:
+            all_rows += test_server_connection(server)
+    total_time = time.perf_counter() - total_start
 
-    total_time = time.time() - total_start
+    print_summary(all_rows, servers, total_time, args.parallel)
+    if args.parallel:
+        real_sweep(servers)
 
-    # Summary
-    print(f"\n{'#'*70}")
-    print(f"# OVERALL SUMMARY")
-    print(f"{'#'*70}")
-    print(f"\nTotal servers: {len(servers)}")
-    print(f"Total time (sequential): {total_time:.2f}s")
-    print(f"Average per server: {total_time/len(servers):.2f}s")
-
-    # Slowest servers
-    print(f"\n🐌 Slowest servers:")
-    sorted_results = sorted(
-        [r for r in all_results if 'total_time' in r],
-        key=lambda x: x['total_time'],
-        reverse=True
-    )[:5]
-
-    for i, result in enumerate(sorted_results, 1):
-        print(f"  {i}. {result['server']:20s} ({result['host']:15s}): {result['total_time']:.2f}s")
-
-    # Failed connections
-    failed = [r for r in all_results if 'error' in r]
-    if failed:
-        print(f"\n❌ Failed connections: {len(failed)}")
-        for result in failed:
-            print(f"  - {result['server']} ({result['host']}): {result['error']}")
-
-    # Expected parallel time
-    if sorted_results:
-        expected_parallel = sorted_results[0]['total_time']
-        print(f"\n⚡ Expected time with parallel execution: {expected_parallel:.2f}s")
-        print(f"   (Time taken by slowest server)")
-
-    # Diagnosis
-    print(f"\n🔍 DIAGNOSIS:")
-    avg_time = sum(r['total_time'] for r in all_results if 'total_time' in r) / len([r for r in all_results if 'total_time' in r])
-
-    if avg_time > 10:
-        print(f"  ⚠️  VERY SLOW: Average {avg_time:.1f}s per server")
-        print(f"     Possible causes:")
-        print(f"     - Network latency (slow network)")
-        print(f"     - SSH key issues (password prompt timeout)")
-        print(f"     - Slow servers (high CPU/load)")
-        print(f"     - Firewall delays")
-    elif avg_time > 5:
-        print(f"  ⚠️  SLOW: Average {avg_time:.1f}s per server")
-        print(f"     Possible causes:")
-        print(f"     - Network latency")
-        print(f"     - Some slow commands (nvidia-smi, docker)")
-    elif avg_time > 2:
-        print(f"  ✅ NORMAL: Average {avg_time:.1f}s per server")
-        print(f"     Performance is acceptable")
-    else:
-        print(f"  ✅ FAST: Average {avg_time:.1f}s per server")
-        print(f"     Performance is excellent!")
+    if args.csv:
+        with open(args.csv, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(all_rows)
+        print(f"\n📄 Timings written to {args.csv}")
 
     print(f"\n{'#'*70}\n")
 
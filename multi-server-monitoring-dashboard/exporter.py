@@ -0,0 +1,153 @@
+"""
+Prometheus Exporter
+Serves the collector's latest snapshot on /metrics
+
+Scrapes never trigger SSH work: the exposition text is rendered from the
+cached snapshot and re-rendered only when the snapshot changes.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class MetricFamily:
+    """Collects samples for one metric name"""
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        if value is not None:
+            self.samples.append((labels, value))
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in self.samples:
+            lines.append(f'{self.name}{_labels(**labels) if labels else ""} {float(value)}')
+        return '\n'.join(lines)
+
+
+def render_metrics(snapshot):
+    """Render a snapshot in the Prometheus text exposition format"""
+    families = {}
+
+    def family(name, kind, help_text):
+        if name not in families:
+            families[name] = MetricFamily(name, kind, help_text)
+        return families[name]
+
+    for data in snapshot['hosts'].values():
+        server = {'server': data['server'], 'host': data['host']}
+        family('server_up', 'gauge', 'Whether the last collection succeeded').add(
+            0 if '🔴' in data['status'] else 1, **server)
+        family('collector_host_collection_seconds', 'gauge', 'Duration of the last collection per host').add(
+            data.get('collect_seconds'), **server)
+
+        metrics = data.get('metrics') or {}
+        if metrics.get('cpu'):
+            family('server_cpu_busy_percent', 'gauge', 'CPU busy percentage').add(metrics['cpu']['busy'], **server)
+            family('server_cpu_iowait_percent', 'gauge', 'CPU iowait percentage').add(metrics['cpu']['iowait'], **server)
+        if metrics.get('memory'):
+            memory = metrics['memory']
+            family('server_memory_total_bytes', 'gauge', 'Total memory').add(memory['mem_total'], **server)
+            family('server_memory_used_bytes', 'gauge', 'Used memory (total - available)').add(memory['mem_used'], **server)
+            family('server_swap_used_bytes', 'gauge', 'Used swap').add(memory['swap_used'], **server)
+        for disk in metrics.get('disks') or []:
+            labels = {**server, 'mount': disk['mount']}
+            family('server_disk_total_bytes', 'gauge', 'Filesystem size').add(disk['total'], **labels)
+            family('server_disk_used_bytes', 'gauge', 'Filesystem used bytes').add(disk['used'], **labels)
+            family('server_disk_used_percent', 'gauge', 'Filesystem used percentage').add(disk['used_percent'], **labels)
+        for gpu in metrics.get('gpus') or []:
+            labels = {**server, 'gpu': gpu['index'], 'name': gpu['name']}
+            family('server_gpu_utilization_percent', 'gauge', 'GPU utilization').add(gpu['utilization'], **labels)
+            family('server_gpu_memory_used_bytes', 'gauge', 'GPU memory used').add(gpu['memory_used'], **labels)
+            family('server_gpu_memory_total_bytes', 'gauge', 'GPU memory total').add(gpu['memory_total'], **labels)
+            family('server_gpu_temperature_celsius', 'gauge', 'GPU temperature').add(gpu['temperature'], **labels)
+            family('server_gpu_power_watts', 'gauge', 'GPU power draw').add(gpu['power_draw'], **labels)
+        # VRAM per GPU and owner, summed over processes so PIDs don't become labels
+        owners = {}
+        for process in metrics.get('gpu_processes') or []:
+            key = (process['gpu_index'], process['container'], process['model'])
+            owners[key] = owners.get(key, 0) + process['memory_used']
+        for (gpu, container, model), used in owners.items():
+            family('server_gpu_process_memory_bytes', 'gauge', 'GPU memory used by compute processes').add(
+                used, **server, gpu=gpu, container=container, model=model)
+        if metrics:
+            family('server_containers_running', 'gauge', 'Running Docker containers').add(
+                len(metrics.get('containers') or []), **server)
+
+    for name, counts in (snapshot.get('stats') or {}).items():
+        family('collector_host_collections_total', 'counter', 'Collections attempted per host').add(
+            counts['collections'], server=name)
+        family('collector_host_failures_total', 'counter', 'Failed collections per host').add(
+            counts['failures'], server=name)
+
+    family('collector_sweep_duration_seconds', 'gauge', 'Duration of the last full sweep').add(
+        snapshot.get('sweep_seconds'))
+    family('collector_last_sweep_timestamp_seconds', 'gauge', 'Unix time the last sweep finished').add(
+        snapshot.get('sweep_finished'))
+
+    return '\n'.join(metric.render() for metric in families.values()) + '\n'
+
+
+class MetricsExporter:
+    """HTTP server for /metrics backed by a SnapshotStore"""
+
+    def __init__(self, store, port=9101, address='0.0.0.0'):
+        self.store = store
+        self.port = port
+        self.address = address
+        self._cache = (None, b'')
+        self._cache_lock = threading.Lock()
+        self._server = None
+
+    def payload(self):
+        """Exposition text for the current snapshot, re-rendered only on change"""
+        snapshot = self.store.latest()
+        with self._cache_lock:
+            version, body = self._cache
+            if version != snapshot['version']:
+                body = render_metrics(snapshot).encode('utf-8')
+                self._cache = (snapshot['version'], body)
+            return body
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.payload()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Don't log every scrape
+
+        self._server = ThreadingHTTPServer((self.address, self.port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, name='metrics-exporter', daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
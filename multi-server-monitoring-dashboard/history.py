@@ -0,0 +1,169 @@
+"""
+Metric History
+Append-only time-series store for collected metrics (SQLite in WAL mode)
+
+Samples are kept at three resolutions: raw (one point per sweep), 1 minute
+and 15 minute averages. Older tiers are rolled up into coarser ones and
+the coarsest tier is trimmed to the retention limit.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+# (table, bucket seconds, how long rows stay in this tier before rolling up)
+TIERS = (
+    ('samples_raw', 0, 6 * 3600),
+    ('samples_1m', 60, 48 * 3600),
+    ('samples_15m', 900, None),  # Trimmed by the retention limit
+)
+
+# Scalar series stored per host, with the labels used in the dashboard
+SERIES = {
+    'cpu_percent': 'CPU %',
+    'mem_percent': 'Memory %',
+    'disk_max_percent': 'Worst Disk %',
+    'gpu_util': 'GPU Util %',
+    'vram_used_gb': 'VRAM Used (GB)',
+    'containers': 'Containers',
+}
+
+
+def host_series(data):
+    """Extract the scalar series for one host from its parsed metrics"""
+    metrics = data.get('metrics') or {}
+    values = {}
+    if metrics.get('cpu'):
+        values['cpu_percent'] = metrics['cpu']['busy']
+    if metrics.get('memory'):
+        values['mem_percent'] = metrics['memory']['mem_percent']
+    if metrics.get('disks'):
+        values['disk_max_percent'] = max(disk['used_percent'] for disk in metrics['disks'])
+    gpus = metrics.get('gpus') or []
+    utilization = [gpu['utilization'] for gpu in gpus if gpu['utilization'] is not None]
+    if utilization:
+        values['gpu_util'] = sum(utilization) / len(utilization)
+    if gpus:
+        values['vram_used_gb'] = sum(gpu['memory_used'] for gpu in gpus) / 1024 ** 3
+    if metrics:
+        values['containers'] = len(metrics.get('containers') or [])
+    return values
+
+
+class HistoryStore:
+    """Batched writer and range reader for metric history"""
+
+    def __init__(self, path='history.db', retention_days=30, batch_size=500,
+                 flush_interval=30, compact_interval=300):
+        self.path = path
+        self.retention = retention_days * 86400
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+
+        self._buffer = []
+        self._last_flush = 0
+        self._last_compact = 0
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        for table, _, _ in TIERS:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                'metric TEXT NOT NULL, server TEXT NOT NULL, ts INTEGER NOT NULL, value REAL NOT NULL, '
+                'PRIMARY KEY (metric, server, ts)) WITHOUT ROWID'
+            )
+        conn.commit()
+
+    def _connection(self):
+        # One connection per thread - WAL lets readers run alongside the writer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record(self, all_data, ts=None):
+        """Queue one sample per host and series; flushes in batches"""
+        ts = int(ts or time.time())
+        rows = [
+            (metric, data['server'], ts, float(value))
+            for data in all_data
+            for metric, value in host_series(data).items()
+        ]
+        with self._write_lock:
+            self._buffer.extend(rows)
+            due = (len(self._buffer) >= self.batch_size
+                   or time.time() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered samples in one transaction and compact if due"""
+        with self._write_lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.time()
+            if rows:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(f'INSERT OR REPLACE INTO {TIERS[0][0]} VALUES (?, ?, ?, ?)', rows)
+            if time.time() - self._last_compact >= self.compact_interval:
+                self._compact()
+                self._last_compact = time.time()
+
+    def _compact(self):
+        """Roll expired rows of each tier into the next one and apply retention"""
+        conn = self._connection()
+        now = int(time.time())
+        with conn:
+            for (table, _, keep), (next_table, bucket, _) in zip(TIERS, TIERS[1:]):
+                cutoff = now - keep
+                # Only roll up whole buckets so a bucket is never averaged twice
+                cutoff -= cutoff % bucket
+                conn.execute(
+                    f'INSERT OR REPLACE INTO {next_table} (metric, server, ts, value) '
+                    f'SELECT metric, server, (ts / {bucket}) * {bucket} AS bucket, AVG(value) '
+                    f'FROM {table} WHERE ts < ? GROUP BY metric, server, bucket',
+                    (cutoff,)
+                )
+                conn.execute(f'DELETE FROM {table} WHERE ts < ?', (cutoff,))
+            conn.execute(f'DELETE FROM {TIERS[-1][0]} WHERE ts < ?', (now - self.retention,))
+
+    def query(self, metric, since, until=None, servers=None):
+        """Return a DataFrame (server, ts, value) for one series over a time range
+
+        The finest tier that still covers ``since`` is used, falling back to
+        coarser tiers for older data.
+        """
+        until = int(until or time.time())
+        since = int(since)
+        now = time.time()
+
+        frames = []
+        newest_covered = until + 1
+        for table, _, keep in TIERS:
+            tier_start = since if keep is None else max(since, int(now - keep))
+            if tier_start < newest_covered:
+                sql = f'SELECT server, ts, value FROM {table} WHERE metric = ? AND ts >= ? AND ts < ?'
+                params = [metric, tier_start, newest_covered]
+                if servers:
+                    sql += f" AND server IN ({', '.join('?' * len(servers))})"
+                    params.extend(servers)
+                frames.append(pd.read_sql_query(sql, self._connection(), params=params))
+                newest_covered = tier_start
+            if newest_covered <= since:
+                break
+
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['server', 'ts', 'value'])
+        frame['ts'] = pd.to_datetime(frame['ts'], unit='s')
+        return frame.sort_values(['server', 'ts'], ignore_index=True)
+
+    def sparklines(self, metric, since):
+        """Return {server: [values...]} for rendering sparkline columns"""
+        frame = self.query(metric, since)
+        return frame.groupby('server')['value'].agg(list).to_dict()
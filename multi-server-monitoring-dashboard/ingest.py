@@ -0,0 +1,247 @@
+"""
+Agent Ingest
+Receives snapshots pushed by agent.py for hosts with ``mode: agent`` in servers.yml
+
+Agents send full snapshots or deltas against their previous push. A delta
+whose base the receiver doesn't hold is answered with 409 so the agent
+resends a full snapshot.
+"""
+
+import hmac
+import json
+import os
+import socketserver
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from parsers import gpu_process_records
+from probe import new_host_data, set_status
+
+# Sections an agent snapshot may contain
+AGENT_SECTIONS = ('uptime', 'cpu', 'memory', 'disks', 'gpus', 'containers', 'gpu_apps', 'ollama_models',
+                  'sample_seconds')
+
+
+def is_agent_host(server):
+    """True for servers that push metrics instead of being polled over SSH"""
+    return server.get('mode') == 'agent'
+
+
+def _human(num_bytes):
+    value = float(num_bytes)
+    for unit in ('B', 'K', 'M', 'G', 'T'):
+        if abs(value) < 1024 or unit == 'T':
+            return f"{value:.1f}{unit}" if unit != 'B' else f"{value:.0f}B"
+        value /= 1024
+
+
+def format_sections(sections):
+    """Text for the detail tabs, rendered from an agent's structured snapshot"""
+    text = {'uptime': sections.get('uptime') or ''}
+
+    cpu = sections.get('cpu')
+    text['cpu'] = (
+        f"%Cpu(s): {cpu['user']} us, {cpu['system']} sy, {cpu['nice']} ni, {cpu['idle']} id, "
+        f"{cpu['iowait']} wa, 0.0 hi, 0.0 si, {cpu['steal']} st" if cpu else ''
+    )
+
+    memory = sections.get('memory')
+    if memory:
+        text['memory'] = '\n'.join([
+            f"{'':6}{'total':>10}{'used':>10}{'available':>12}",
+            f"{'Mem:':6}{_human(memory['mem_total']):>10}{_human(memory['mem_used']):>10}"
+            f"{_human(memory['mem_available']):>12}",
+            f"{'Swap:':6}{_human(memory['swap_total']):>10}{_human(memory['swap_used']):>10}",
+        ])
+    else:
+        text['memory'] = ''
+
+    lines = [f"{'Filesystem':<24}{'Size':>8}{'Used':>8}{'Avail':>8}{'Use%':>6}  Mounted on"]
+    for disk in sections.get('disks') or []:
+        lines.append(f"{disk['filesystem']:<24}{_human(disk['total']):>8}{_human(disk['used']):>8}"
+                     f"{_human(disk['available']):>8}{disk['used_percent']:>5.0f}%  {disk['mount']}")
+    text['disk'] = '\n'.join(lines)
+
+    gpus = sections.get('gpus') or []
+    if gpus:
+        text['nvidia'] = '\n'.join(
+            f"GPU {gpu['index']}: {gpu['name']} | {gpu['utilization']}% util | "
+            f"{_human(gpu['memory_used'])} / {_human(gpu['memory_total'])} | "
+            f"{gpu['temperature']}C | {gpu['power_draw']}W"
+            for gpu in gpus
+        )
+    else:
+        text['nvidia'] = 'Not available'
+
+    containers = sections.get('containers')
+    if containers is None:
+        text['docker'] = 'Not available'
+    else:
+        lines = [f"{'CONTAINER ID':<14}{'IMAGE':<40}{'STATUS':<24}NAMES"]
+        lines += [f"{c['id']:<14}{c['image']:<40}{c['status']:<24}{c['name']}" for c in containers]
+        text['docker'] = '\n'.join(lines)
+    return text
+
+
+class AgentReceiver:
+    """HTTP endpoint (TCP and/or Unix socket) that turns agent pushes into host data
+
+    ``on_result(data)`` is called with a data dict shaped like the SSH
+    engines' output for every accepted push and whenever an agent goes quiet.
+    """
+
+    def __init__(self, servers, port=9102, address='0.0.0.0', socket_path=None, token='', stale_after=60):
+        self.servers = {server['name']: server for server in servers}
+        self.port = port
+        self.address = address
+        self.socket_path = socket_path
+        self.token = token
+        self.stale_after = stale_after
+        self.on_result = None
+
+        self._state = {}  # name -> {'seq', 'sections', 'received', 'interval'}
+        self._offline = set()
+        self._started = None
+        self._lock = threading.Lock()
+        self._servers = []
+
+    def update_servers(self, servers):
+        """Follow servers.yml reloads (agent hosts added, renamed or removed)"""
+        with self._lock:
+            self.servers = {server['name']: server for server in servers}
+            for name in set(self._state) - set(self.servers):
+                del self._state[name]
+
+    def apply(self, payload):
+        """Merge one push into the host's state; returns (HTTP status, message)"""
+        server = self.servers.get(payload.get('name'))
+        if server is None:
+            return 404, f"unknown agent host {payload.get('name')!r}"
+
+        sections = {key: value for key, value in (payload.get('sections') or {}).items() if key in AGENT_SECTIONS}
+        with self._lock:
+            state = self._state.get(server['name'])
+            if payload.get('base') is None:
+                state = self._state[server['name']] = {'sections': sections}
+            elif state is None or state['seq'] != payload['base']:
+                return 409, 'unknown base snapshot, send a full snapshot'
+            else:
+                state['sections'].update(sections)
+            state['seq'] = payload.get('seq')
+            state['received'] = time.time()
+            state['interval'] = float(payload.get('interval') or 15)
+            self._offline.discard(server['name'])
+            data = self.host_data(server, state['sections'])
+
+        if self.on_result is not None:
+            self.on_result(data)
+        return 200, 'ok'
+
+    @staticmethod
+    def host_data(server, sections):
+        data = new_host_data(server)
+        data.update(format_sections(sections))
+        data['metrics'] = {kind: sections.get(kind) for kind in ('cpu', 'memory')}
+        data['metrics'].update({kind: sections.get(kind) or [] for kind in ('disks', 'gpus', 'containers')})
+        processes = gpu_process_records(sections.get('gpu_apps') or [], data['metrics']['containers'],
+                                        [tuple(model) for model in sections.get('ollama_models') or []])
+        data['metrics']['gpu_processes'] = [asdict(record) for record in processes]
+        data['collection_mode'] = 'agent'
+        data['collect_seconds'] = sections.get('sample_seconds')
+        set_status(data)
+        return data
+
+    @staticmethod
+    def offline_data(server, state=None):
+        data = new_host_data(server)
+        data['collection_mode'] = 'agent'
+        if state:
+            since = datetime.fromtimestamp(state['received']).strftime("%Y-%m-%d %H:%M:%S")
+            data['uptime'] = f"Error: no agent push since {since}"
+        else:
+            data['uptime'] = "Error: agent has not pushed yet"
+        set_status(data)
+        return data
+
+    def expire_stale(self):
+        """Publish offline data for agent hosts that stopped pushing"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for name, state in self._state.items():
+                limit = max(self.stale_after, 3 * state['interval'])
+                if name not in self._offline and now - state['received'] > limit:
+                    self._offline.add(name)
+                    expired.append(self.offline_data(self.servers[name], state))
+
+        for data in expired:
+            self.on_result(data)
+        return len(expired)
+
+    def _check_token(self, header):
+        if not self.token:
+            return True
+        return hmac.compare_digest(header or '', f'Bearer {self.token}')
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?')[0] != '/ingest':
+                    self.send_error(404)
+                    return
+                if not receiver._check_token(self.headers.get('Authorization')):
+                    self.send_error(401)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    payload = json.loads(self.rfile.read(length))
+                    status, message = receiver.apply(payload)
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    status, message = 400, f"bad payload: {e}"
+                body = message.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Don't log every push
+
+        return Handler
+
+    def start(self, on_result):
+        """Start listening; safe to call more than once"""
+        self.on_result = on_result
+        if self._started is not None:
+            return self
+        self._started = time.time()
+
+        # Show agent hosts as offline until their first push arrives
+        with self._lock:
+            waiting = [server for name, server in self.servers.items() if name not in self._state]
+            self._offline.update(server['name'] for server in waiting)
+        for server in waiting:
+            on_result(self.offline_data(server))
+
+        handler = self._handler()
+        if self.port:
+            self._servers.append(ThreadingHTTPServer((self.address, self.port), handler))
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # Left over from a previous run
+            self._servers.append(socketserver.ThreadingUnixStreamServer(self.socket_path, handler))
+
+        for server in self._servers:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='agent-ingest', daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
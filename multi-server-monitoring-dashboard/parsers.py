@@ -0,0 +1,398 @@
+"""
+Metric Parsers
+Turn raw command output into fixed-schema records that can be sorted,
+aggregated and alerted on
+"""
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, fields
+
+import pandas as pd
+
+# Filesystems that never hold model weights or data worth alerting on
+PSEUDO_FILESYSTEMS = ('tmpfs', 'devtmpfs', 'overlay', 'squashfs', 'udev', 'none', 'shm')
+
+
+@dataclass
+class CpuRecord:
+    user: float
+    system: float
+    nice: float
+    idle: float
+    iowait: float
+    steal: float
+    busy: float
+
+
+@dataclass
+class MemoryRecord:
+    mem_total: int
+    mem_used: int
+    mem_available: int
+    swap_total: int
+    swap_used: int
+    mem_percent: float
+
+
+@dataclass
+class DiskRecord:
+    mount: str
+    filesystem: str
+    total: int
+    used: int
+    available: int
+    used_percent: float
+
+
+@dataclass
+class GpuRecord:
+    index: int
+    name: str
+    utilization: float
+    memory_used: int
+    memory_total: int
+    temperature: float
+    power_draw: float
+    memory_percent: float
+
+
+@dataclass
+class ContainerRecord:
+    id: str
+    image: str
+    name: str
+    status: str
+
+
+@dataclass
+class GpuProcessRecord:
+    pid: int
+    gpu_index: int
+    process: str
+    memory_used: int
+    container: str
+    model: str
+
+
+# Record type for each list in a host's metrics dict
+RECORD_TYPES = {
+    'cpu': CpuRecord,
+    'memory': MemoryRecord,
+    'disks': DiskRecord,
+    'gpus': GpuRecord,
+    'containers': ContainerRecord,
+    'gpu_processes': GpuProcessRecord,
+}
+
+# VRAM changes smaller than this between snapshots are not reported as changes
+GPU_CHANGE_THRESHOLD = 64 * 1024 * 1024
+
+# Model name in vLLM command lines: `vllm serve <model>` or `--model <model>`
+VLLM_MODEL_PATTERN = re.compile(r'(?:\bserve\s+|--model[= ]+)([^\s-][^\s]*)')
+
+
+def _is_unavailable(text):
+    return not text or text == 'Not available' or text.startswith(('Error:', 'Connection Error:'))
+
+
+def _number(value):
+    """Parse a numeric CSV field, returning None for [N/A] / [Not Supported]"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_cpu(text):
+    """Parse the `top -bn1` "%Cpu(s):" line"""
+    if _is_unavailable(text):
+        return None
+    values = {label: float(value.replace(',', '.'))
+              for value, label in re.findall(r'(\d+(?:[.,]\d+)?)%?\s*(us|sy|ni|id|wa|hi|si|st)\b', text)}
+    if 'id' not in values:
+        return None
+    return CpuRecord(
+        user=values.get('us', 0.0),
+        system=values.get('sy', 0.0),
+        nice=values.get('ni', 0.0),
+        idle=values['id'],
+        iowait=values.get('wa', 0.0),
+        steal=values.get('st', 0.0),
+        busy=round(100.0 - values['id'], 1)
+    )
+
+
+def parse_meminfo(text):
+    """Parse /proc/meminfo into byte counts"""
+    if _is_unavailable(text):
+        return None
+    values = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            # /proc/meminfo reports kB (KiB)
+            values[key.strip()] = int(parts[0]) * 1024
+    if 'MemTotal' not in values:
+        return None
+
+    total = values['MemTotal']
+    available = values.get('MemAvailable', values.get('MemFree', 0))
+    used = total - available
+    return MemoryRecord(
+        mem_total=total,
+        mem_used=used,
+        mem_available=available,
+        swap_total=values.get('SwapTotal', 0),
+        swap_used=values.get('SwapTotal', 0) - values.get('SwapFree', 0),
+        mem_percent=round(100.0 * used / total, 1) if total else 0.0
+    )
+
+
+def parse_df(text):
+    """Parse `df -B1 -P` output, skipping pseudo filesystems"""
+    if _is_unavailable(text):
+        return []
+    records = []
+    for line in text.splitlines()[1:]:
+        parts = line.split(None, 5)
+        if len(parts) < 6 or not parts[1].isdigit():
+            continue
+        filesystem, total, used, available, _, mount = parts
+        if filesystem in PSEUDO_FILESYSTEMS or int(total) == 0:
+            continue
+        total, used, available = int(total), int(used), int(available)
+        records.append(DiskRecord(
+            mount=mount,
+            filesystem=filesystem,
+            total=total,
+            used=used,
+            available=available,
+            used_percent=round(100.0 * used / (used + available), 1) if used + available else 0.0
+        ))
+    return records
+
+
+def parse_gpu_query(text):
+    """Parse `nvidia-smi --query-gpu=index,name,utilization.gpu,memory.used,
+    memory.total,temperature.gpu,power.draw --format=csv,noheader,nounits`"""
+    if _is_unavailable(text):
+        return []
+    records = []
+    for line in text.splitlines():
+        parts = [part.strip() for part in line.split(',')]
+        if len(parts) != 7 or not parts[0].isdigit():
+            continue
+        index, name, utilization, memory_used, memory_total, temperature, power_draw = parts
+        # nvidia-smi reports memory in MiB
+        used = int(_number(memory_used) or 0) * 1024 * 1024
+        total = int(_number(memory_total) or 0) * 1024 * 1024
+        records.append(GpuRecord(
+            index=int(index),
+            name=name,
+            utilization=_number(utilization),
+            memory_used=used,
+            memory_total=total,
+            temperature=_number(temperature),
+            power_draw=_number(power_draw),
+            memory_percent=round(100.0 * used / total, 1) if total else 0.0
+        ))
+    return records
+
+
+def parse_containers(text):
+    """Parse `docker ps --format '{{.ID}}\\t{{.Image}}\\t{{.Names}}\\t{{.Status}}'`"""
+    if _is_unavailable(text):
+        return []
+    records = []
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if len(parts) == 4:
+            records.append(ContainerRecord(*parts))
+    return records
+
+
+def parse_gpu_apps(text):
+    """Parse the probe's `gpu_apps` section into raw per-process dicts
+
+    The section holds ``gpu<TAB>index<TAB>uuid`` lines (from --query-gpu)
+    followed by ``app<TAB>pid<TAB>uuid<TAB>MiB<TAB>name<TAB>cgroup id<TAB>
+    cmdline<TAB>parent cmdline`` lines (from --query-compute-apps and /proc).
+    """
+    if _is_unavailable(text):
+        return []
+    indexes = {}
+    apps = []
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if parts[0] == 'gpu' and len(parts) == 3 and parts[1].strip().isdigit():
+            indexes[parts[2].strip()] = int(parts[1])
+        elif parts[0] == 'app' and 5 <= len(parts) <= 8 and parts[1].strip().isdigit():
+            # Empty trailing fields are lost when the section output is stripped
+            _, pid, uuid, memory, name, container_id, cmdline, parent_cmdline = parts + [''] * (8 - len(parts))
+            apps.append({
+                'pid': int(pid),
+                'gpu_uuid': uuid.strip(),
+                'memory_used': int(_number(memory) or 0) * 1024 * 1024,
+                'process': name.strip(),
+                'container_id': container_id.strip(),
+                'cmdline': f"{cmdline.strip()} {parent_cmdline.strip()}".strip(),
+            })
+    for app in apps:
+        app['gpu_index'] = indexes.get(app.pop('gpu_uuid'), -1)
+    return apps
+
+
+def parse_ollama_ps(text):
+    """Parse Ollama's /api/ps response into [(model name, VRAM bytes)]"""
+    if _is_unavailable(text):
+        return []
+    try:
+        models = json.loads(text).get('models') or []
+    except (ValueError, AttributeError):
+        return []
+    return [(model.get('name', ''), int(model.get('size_vram') or 0)) for model in models]
+
+
+def _model_for(app, ollama_models):
+    """Best guess at the model a GPU process is serving"""
+    match = VLLM_MODEL_PATTERN.search(app['cmdline']) if 'vllm' in app['cmdline'].lower() else None
+    if match:
+        return match.group(1)
+    executables = [app['process'], *app['cmdline'].split()[:1]]
+    if any(os.path.basename(path).startswith('ollama') for path in executables) and ollama_models:
+        # Ollama runs one runner process per loaded model; /api/ps doesn't report
+        # PIDs, so pair the runner with the model whose VRAM size is closest
+        name, size = min(ollama_models, key=lambda model: abs(model[1] - app['memory_used']))
+        ollama_models.remove((name, size))
+        return name
+    return ''
+
+
+def gpu_process_records(apps, containers, ollama_models):
+    """Attribute raw GPU processes to Docker containers and Ollama/vLLM models
+
+    ``containers`` are container dicts/records (12-character IDs), matched
+    against the container ID found in each process's cgroup path.
+    """
+    names = {container['id']: container['name'] for container in containers}
+    ollama_models = list(ollama_models)
+    records = []
+    for app in sorted(apps, key=lambda app: -app['memory_used']):
+        container_id = app.get('container_id', '')
+        records.append(GpuProcessRecord(
+            pid=app['pid'],
+            gpu_index=app['gpu_index'],
+            process=app['process'],
+            memory_used=app['memory_used'],
+            container=names.get(container_id[:12], container_id[:12]),
+            model=_model_for(app, ollama_models),
+        ))
+    return sorted(records, key=lambda record: (record.gpu_index, -record.memory_used))
+
+
+def gpu_process_changes(previous, current, threshold=GPU_CHANGE_THRESHOLD):
+    """Differences between two lists of GPU process dicts
+
+    Returns rows for processes that started, exited, or whose VRAM grew or
+    shrank by at least ``threshold`` bytes - what the UI shows instead of
+    the full process list.
+    """
+    before = {(process['pid'], process['gpu_index']): process for process in previous or []}
+    after = {(process['pid'], process['gpu_index']): process for process in current or []}
+    changes = []
+    for key, process in after.items():
+        old = before.get(key)
+        if old is None:
+            changes.append({'change': 'started', **process, 'delta': process['memory_used']})
+        elif abs(process['memory_used'] - old['memory_used']) >= threshold:
+            delta = process['memory_used'] - old['memory_used']
+            changes.append({'change': 'grew' if delta > 0 else 'shrank', **process, 'delta': delta})
+    for key, process in before.items():
+        if key not in after:
+            changes.append({'change': 'exited', **process, 'delta': -process['memory_used']})
+    return sorted(changes, key=lambda change: -abs(change['delta']))
+
+
+def parse_metrics(data):
+    """Parse every machine-readable section of a host's data dict
+
+    Returns a JSON-friendly dict: 'cpu' and 'memory' are a single record
+    (or None), 'disks', 'gpus', 'containers' and 'gpu_processes' are
+    lists of records.
+    """
+    cpu = parse_cpu(data.get('cpu', ''))
+    memory = parse_meminfo(data.get('meminfo', ''))
+    containers = [asdict(record) for record in parse_containers(data.get('containers', ''))]
+    processes = gpu_process_records(parse_gpu_apps(data.get('gpu_apps', '')), containers,
+                                    parse_ollama_ps(data.get('ollama_ps', '')))
+    return {
+        'cpu': asdict(cpu) if cpu else None,
+        'memory': asdict(memory) if memory else None,
+        'disks': [asdict(record) for record in parse_df(data.get('disk_bytes', ''))],
+        'gpus': [asdict(record) for record in parse_gpu_query(data.get('gpu_query', ''))],
+        'containers': containers,
+        'gpu_processes': [asdict(record) for record in processes],
+    }
+
+
+def record_columns(kind):
+    """Column names for a metric kind, in schema order"""
+    return [field.name for field in fields(RECORD_TYPES[kind])]
+
+
+def metrics_rows(all_data, kind):
+    """Flatten one metric kind across hosts into rows tagged with the host name"""
+    rows = []
+    for data in all_data:
+        value = (data.get('metrics') or {}).get(kind)
+        if value is None:
+            continue
+        for record in (value if isinstance(value, list) else [value]):
+            rows.append({'server': data['server'], **record})
+    return rows
+
+
+def metrics_frame(all_data, kind):
+    """Build a fleet-wide pandas DataFrame for one metric kind"""
+    frame = pd.DataFrame.from_records(metrics_rows(all_data, kind), columns=['server'] + record_columns(kind))
+    # Keep numeric dtypes even when the frame is empty or has missing values
+    dtypes = {field.name: {float: 'float64', int: 'int64'}[field.type]
+              for field in fields(RECORD_TYPES[kind]) if field.type in (float, int)}
+    return frame.astype(dtypes)
+
+
+def fleet_frame(all_data):
+    """One row per host/GPU with the headline numbers for the fleet overview
+
+    Hosts without GPUs get a single row with empty GPU columns.
+    """
+    hosts = pd.DataFrame.from_records(
+        [{'server': data['server'], 'host': data['host'], 'status': data['status']} for data in all_data],
+        columns=['server', 'host', 'status']
+    )
+    cpu = metrics_frame(all_data, 'cpu')[['server', 'busy']].rename(columns={'busy': 'cpu_percent'})
+    memory = metrics_frame(all_data, 'memory')[['server', 'mem_percent']]
+    disks = (metrics_frame(all_data, 'disks')
+             .groupby('server', as_index=False)['used_percent'].max()
+             .rename(columns={'used_percent': 'disk_max_percent'}))
+    containers = (metrics_frame(all_data, 'containers')
+                  .groupby('server', as_index=False).size()
+                  .rename(columns={'size': 'containers'}))
+    gpus = metrics_frame(all_data, 'gpus').rename(columns={
+        'index': 'gpu',
+        'name': 'gpu_name',
+        'utilization': 'gpu_util',
+        'memory_percent': 'vram_percent',
+    })
+    gpus['vram_used_gb'] = gpus['memory_used'] / 1024 ** 3
+    gpus = gpus[['server', 'gpu', 'gpu_name', 'gpu_util', 'vram_used_gb', 'vram_percent']]
+
+    frame = hosts
+    for part in (cpu, memory, disks, containers, gpus):
+        frame = frame.merge(part, on='server', how='left')
+    frame['containers'] = frame['containers'].fillna(0).astype(int)
+    frame['gpu'] = frame['gpu'].astype('Int64')
+    return frame
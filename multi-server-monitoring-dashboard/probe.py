@@ -0,0 +1,164 @@
+"""
+Composite Probe
+Runs every monitoring command in one SSH exec and frames the results
+"""
+
+import shlex
+import uuid
+from datetime import datetime
+
+# GPU compute processes with the container ID from their cgroup and their command
+# lines (plus the parent's, since vLLM workers rename themselves), see parsers.parse_gpu_apps
+GPU_APPS_COMMAND = r'''nvidia-smi --query-gpu=index,uuid --format=csv,noheader 2>/dev/null |
+while IFS=', ' read -r index uuid; do printf 'gpu\t%s\t%s\n' "$index" "$uuid"; done
+nvidia-smi --query-compute-apps=pid,gpu_uuid,used_memory,process_name --format=csv,noheader,nounits 2>/dev/null |
+while IFS=', ' read -r pid uuid mem name; do
+  cid=$(grep -o -E '[0-9a-f]{64}' /proc/$pid/cgroup 2>/dev/null | head -n1)
+  ppid=$(awk '{print $4}' /proc/$pid/stat 2>/dev/null)
+  printf 'app\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' "$pid" "$uuid" "$mem" "$name" "$cid" \
+    "$(tr '\0\t\n' '   ' 2>/dev/null </proc/$pid/cmdline | cut -c1-300)" \
+    "$(tr '\0\t\n' '   ' 2>/dev/null </proc/${ppid:-0}/cmdline | cut -c1-300)"
+done'''
+
+# Monitoring commands, keyed by the field they fill in the data dict
+COMMANDS = {
+    'uptime': 'uptime',
+    'cpu': "top -bn1 | grep 'Cpu(s)' | head -1",
+    'disk': 'df -h',
+    'memory': 'free -h',
+    'nvidia': 'nvidia-smi 2>/dev/null || echo "Not available"',
+    'docker': 'docker ps 2>/dev/null || echo "Not available"',
+    # Machine-readable sections for parsers.py
+    'meminfo': 'cat /proc/meminfo',
+    'disk_bytes': 'df -B1 -P',
+    'gpu_query': ('nvidia-smi --query-gpu=index,name,utilization.gpu,memory.used,memory.total,'
+                  'temperature.gpu,power.draw --format=csv,noheader,nounits 2>/dev/null'),
+    'containers': "docker ps --format '{{.ID}}\t{{.Image}}\t{{.Names}}\t{{.Status}}' 2>/dev/null",
+    'gpu_apps': GPU_APPS_COMMAND,
+    'ollama_ps': 'curl -s -m 2 http://localhost:11434/api/ps 2>/dev/null',
+}
+
+# Channels the one-command-per-channel fallback opens at once on a connection.
+# Stays below OpenSSH's default MaxSessions (10)
+FALLBACK_CHANNELS = 6
+
+
+class ProbeError(Exception):
+    """Raised when a probe payload is missing or incomplete"""
+
+
+def build_probe_script(commands=COMMANDS):
+    """Build a POSIX sh script that runs all commands in parallel
+
+    Returns (script, nonce). Each section is written back between
+    ``@@<nonce> ...@@`` marker lines so command output cannot be mistaken
+    for framing. Commands run concurrently, so the slowest one (usually
+    ``top -bn1`` or ``nvidia-smi``) bounds the probe time.
+    """
+    nonce = uuid.uuid4().hex
+    lines = [
+        'd=$(mktemp -d 2>/dev/null || { mkdir -p /tmp/probe.$$ && echo /tmp/probe.$$; })',
+    ]
+    for key, command in commands.items():
+        lines.append(
+            f'{{ ( {command} ) >"$d/{key}.out" 2>"$d/{key}.err"; echo $? >"$d/{key}.rc"; }} &'
+        )
+    lines.append('wait')
+    for key in commands:
+        lines.append(f"echo '@@{nonce} BEGIN {key}@@'")
+        lines.append(f'cat "$d/{key}.out"')
+        lines.append(f"echo '@@{nonce} STDERR {key}@@'")
+        lines.append(f'cat "$d/{key}.err"')
+        lines.append(f"echo \"@@{nonce} END {key} $(cat \"$d/{key}.rc\")@@\"")
+    lines.append('rm -rf "$d"')
+    lines.append(f"echo '@@{nonce} DONE@@'")
+    return '\n'.join(lines), nonce
+
+
+def probe_command(script):
+    """Wrap a probe script so it runs under sh whatever the login shell is"""
+    return f"sh -c {shlex.quote(script)}"
+
+
+def parse_probe_output(payload, nonce, expected=COMMANDS):
+    """Split a probe payload into {key: (stdout, stderr, exit_status)}
+
+    Raises ProbeError if the payload is truncated or a section is missing.
+    """
+    sections = {}
+    current = None
+    stream = None
+    out_lines, err_lines = [], []
+    done = False
+
+    for line in payload.splitlines():
+        if line.startswith(f'@@{nonce} ') and line.endswith('@@'):
+            parts = line[len(nonce) + 3:-2].split()
+            marker = parts[0] if parts else ''
+            if marker == 'BEGIN' and len(parts) == 2:
+                current, stream = parts[1], 'out'
+                out_lines, err_lines = [], []
+            elif marker == 'STDERR' and current is not None:
+                stream = 'err'
+            elif marker == 'END' and current is not None:
+                try:
+                    exit_status = int(parts[2])
+                except (IndexError, ValueError):
+                    exit_status = -1
+                sections[current] = ('\n'.join(out_lines), '\n'.join(err_lines), exit_status)
+                current, stream = None, None
+            elif marker == 'DONE':
+                done = True
+            continue
+
+        if stream == 'out':
+            out_lines.append(line)
+        elif stream == 'err':
+            err_lines.append(line)
+
+    missing = [key for key in expected if key not in sections]
+    if not done or missing:
+        raise ProbeError(f"Incomplete probe output (missing: {', '.join(missing) or 'DONE marker'})")
+
+    return sections
+
+
+def format_section(output, error_output):
+    """Turn raw command output into the value stored in the data dict"""
+    output = output.strip()
+    error_output = error_output.strip()
+
+    # If we got output, use it; otherwise check for errors
+    if output:
+        return output
+    if error_output and 'not found' not in error_output.lower():
+        return f"Error: {error_output}"
+    return "Not available"
+
+
+def new_host_data(server):
+    """Empty data dict for a server, filled in by the collection engines"""
+    return {
+        'server': server['name'],
+        'host': server['host'],
+        'status': 'Unknown',
+        'uptime': '',
+        'cpu': '',
+        'disk': '',
+        'memory': '',
+        'nvidia': '',
+        'docker': '',
+        'metrics': None,
+        'gpu_changes': None,
+        'collection_mode': '',
+        'collect_seconds': None,
+        'last_updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def set_status(data):
+    """Set the status field based on whether uptime was collected"""
+    if data.get('uptime') and not data['uptime'].startswith('Error'):
+        data['status'] = '🟢 Online'
+    else:
+        data['status'] = '🔴 Offline'
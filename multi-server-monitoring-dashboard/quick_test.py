@@ -2,8 +2,6 @@
 """Quick test to measure actual collection time"""
 
 import time
-import yaml
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 import os
 
@@ -11,12 +9,12 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 # Import from app.py
-from app import ServerMonitor
+from app import COLLECTION_ENGINE, MAX_PARALLEL, ASYNC_MAX_CONCURRENCY, create_monitor
 
 def main():
     print("🔍 Quick Performance Test\n")
 
-    monitor = ServerMonitor()
+    monitor = create_monitor()
 
     if not monitor.servers:
         print("❌ No servers configured in servers.yml")
@@ -28,25 +26,22 @@ def main():
     start = time.time()
 
     print("⏱️  Starting parallel data collection...")
+
+    if COLLECTION_ENGINE == 'async':
+        max_parallel = min(ASYNC_MAX_CONCURRENCY, len(monitor.servers))
+        print(f"  → Using async engine with up to {max_parallel} concurrent hosts\n")
+    else:
+        max_parallel = min(MAX_PARALLEL, len(monitor.servers))
+        print(f"  → Using {max_parallel} parallel workers\n")
+
     all_data = []
 
-    # Limit concurrent connections to avoid Paramiko race conditions
-    max_parallel = min(6, len(monitor.servers))
-    print(f"  → Using {max_parallel} parallel workers\n")
-
-    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
-        future_to_server = {
-            executor.submit(monitor.collect_all_data, server): server
-            for server in monitor.servers
-        }
-
-        completed = 0
-        for future in as_completed(future_to_server):
-            data = future.result()
-            all_data.append(data)
-            completed += 1
-            elapsed = time.time() - start
-            print(f"  ✓ Server {completed}/{len(monitor.servers)} completed ({elapsed:.1f}s elapsed)")
+    def report_progress(data):
+        all_data.append(data)
+        elapsed = time.time() - start
+        print(f"  ✓ Server {len(all_data)}/{len(monitor.servers)} completed ({elapsed:.1f}s elapsed)")
+
+    monitor.collect_many(on_result=report_progress)
 
     total_time = time.time() - start
 
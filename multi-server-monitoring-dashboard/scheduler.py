@@ -0,0 +1,126 @@
+"""
+Adaptive Polling Scheduler
+Gives every host its own polling cadence instead of one fleet-wide interval
+
+- Busy or fast-changing hosts (e.g. GPU nodes serving inference) are polled more often
+- Hosts whose metrics stay flat back off gradually
+- Unreachable hosts back off exponentially
+- ``priority: high|normal|low`` in servers.yml scales the base interval
+"""
+
+import threading
+import time
+
+from history import host_series
+
+PRIORITY_FACTORS = {'high': 0.5, 'normal': 1.0, 'low': 2.0}
+
+# A change of at least this much between two polls counts as "volatile"
+CHANGE_THRESHOLDS = {
+    'cpu_percent': 10.0,
+    'mem_percent': 5.0,
+    'disk_max_percent': 1.0,
+    'gpu_util': 10.0,
+    'vram_used_gb': 1.0,
+    'containers': 1.0,
+}
+
+# A host at or above these levels counts as "busy"
+BUSY_THRESHOLDS = {'cpu_percent': 80.0, 'gpu_util': 50.0}
+
+
+class HostSchedule:
+    def __init__(self, base_interval):
+        self.base_interval = base_interval
+        self.interval = base_interval
+        self.next_due = 0.0
+        self.failures = 0
+        self.last_series = None
+
+
+class AdaptiveScheduler:
+    """Tracks when each host is next due and adapts its interval after each poll"""
+
+    def __init__(self, base_interval=60, min_interval=15, max_static_factor=4, max_backoff=900):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_static_factor = max_static_factor
+        self.max_backoff = max_backoff
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _schedule_for(self, server):
+        schedule = self._hosts.get(server['name'])
+        base = self.base_interval * PRIORITY_FACTORS.get(server.get('priority', 'normal'), 1.0)
+        if schedule is None:
+            schedule = self._hosts[server['name']] = HostSchedule(base)
+        schedule.base_interval = base  # Priority may change on config reload
+        return schedule
+
+    def due(self, servers, now=None):
+        """Return the servers whose next poll is due"""
+        now = now or time.time()
+        with self._lock:
+            return [server for server in servers if self._schedule_for(server).next_due <= now]
+
+    def seconds_until_next(self, servers, now=None):
+        """Seconds until the next host is due (0 if one already is)"""
+        now = now or time.time()
+        with self._lock:
+            if not servers:
+                return self.base_interval
+            next_due = min(self._schedule_for(server).next_due for server in servers)
+        return max(0.0, next_due - now)
+
+    def record(self, server, data, now=None):
+        """Update a host's interval from the result of its latest poll"""
+        now = now or time.time()
+        with self._lock:
+            schedule = self._schedule_for(server)
+
+            if '🔴' in data['status']:
+                self._back_off(schedule)
+            else:
+                schedule.failures = 0
+                series = host_series(data)
+                if self._is_busy(series) or self._is_volatile(schedule.last_series, series):
+                    schedule.interval = max(self.min_interval, schedule.interval / 2)
+                else:
+                    schedule.interval = min(schedule.base_interval * self.max_static_factor, schedule.interval * 1.5)
+                schedule.last_series = series
+
+            schedule.next_due = now + schedule.interval
+            return schedule.interval
+
+    def record_failure(self, server, now=None):
+        """Back a host off after a poll that produced no data at all"""
+        now = now or time.time()
+        with self._lock:
+            schedule = self._schedule_for(server)
+            self._back_off(schedule)
+            schedule.next_due = now + schedule.interval
+            return schedule.interval
+
+    def _back_off(self, schedule):
+        schedule.failures += 1
+        schedule.interval = min(self.max_backoff, schedule.base_interval * 2 ** schedule.failures)
+        schedule.last_series = None
+
+    def intervals(self):
+        """Current interval per host, for display"""
+        with self._lock:
+            return {name: schedule.interval for name, schedule in self._hosts.items()}
+
+    @staticmethod
+    def _is_busy(series):
+        return any(series.get(metric, 0) >= threshold for metric, threshold in BUSY_THRESHOLDS.items())
+
+    @staticmethod
+    def _is_volatile(previous, series):
+        if previous is None:
+            return False
+        return any(
+            abs(series[metric] - previous[metric]) >= threshold
+            for metric, threshold in CHANGE_THRESHOLDS.items()
+            if metric in series and metric in previous
+        )
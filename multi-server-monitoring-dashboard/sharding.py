@@ -0,0 +1,86 @@
+"""
+Inventory Sharding
+Splits the server list across collector processes and merges their snapshots
+
+Hosts are assigned to shards with a consistent-hash ring, so changing the
+shard count only moves about 1/N of the hosts. Each shard's collector writes
+its own snapshot file; dashboards read them through ShardedSnapshotStore.
+"""
+
+import bisect
+import hashlib
+import os
+import time
+
+from collector import SnapshotStore
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring over ``shards`` shards with virtual nodes"""
+
+    def __init__(self, shards, replicas=64):
+        self.shards = shards
+        ring = sorted((_hash(f"shard-{shard}-{replica}"), shard)
+                      for shard in range(shards) for replica in range(replicas))
+        self._keys = [key for key, _ in ring]
+        self._owners = [shard for _, shard in ring]
+
+    def shard_for(self, name):
+        if self.shards <= 1:
+            return 0
+        position = bisect.bisect(self._keys, _hash(name)) % len(self._keys)
+        return self._owners[position]
+
+    def servers_for(self, servers, shard):
+        """The servers owned by one shard"""
+        return [server for server in servers if self.shard_for(server['name']) == shard]
+
+
+def shard_path(path, shard):
+    """Snapshot file for one shard, e.g. snapshot.json -> snapshot.shard2.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard}{ext}"
+
+
+class ShardedSnapshotStore:
+    """Read-only merged view over the snapshot files of sharded collectors
+
+    Offers the same latest() / wait_for_update() interface as SnapshotStore.
+    """
+
+    def __init__(self, path, shards):
+        self.path = path
+        self.stores = [SnapshotStore(shard_path(path, shard)) for shard in range(shards)]
+
+    def latest(self):
+        snapshots = [store.latest() for store in self.stores]
+        hosts, stats = {}, {}
+        for snapshot in snapshots:
+            hosts.update(snapshot['hosts'])
+            stats.update(snapshot['stats'] or {})
+
+        started = [snapshot['sweep_started'] for snapshot in snapshots if snapshot['sweep_started']]
+        finished = [snapshot['sweep_finished'] for snapshot in snapshots if snapshot['sweep_finished']]
+        seconds = [snapshot['sweep_seconds'] for snapshot in snapshots if snapshot['sweep_seconds']]
+        return {
+            'hosts': hosts,
+            'version': sum(snapshot['version'] for snapshot in snapshots),
+            'sweep_started': min(started) if started else None,
+            # The oldest shard decides how fresh the merged view is
+            'sweep_finished': min(finished) if finished else None,
+            'sweep_seconds': max(seconds) if seconds else None,
+            'stats': stats,
+        }
+
+    def wait_for_update(self, version, timeout):
+        """Poll the shard files until the merged snapshot is newer than ``version``"""
+        deadline = time.time() + timeout
+        current = self.latest()['version']
+        while current <= version and time.time() < deadline:
+            time.sleep(min(0.25, max(0, deadline - time.time())))
+            current = self.latest()['version']
+        return current
@@ -0,0 +1,200 @@
+"""
+SSH Keys
+Process-wide cache of parsed private keys and a pinned known_hosts store
+
+Private keys are parsed once per process (and again only when the file
+changes) instead of on every connect. Server host keys are checked against
+an in-memory copy of KNOWN_HOSTS_FILE; with the default trust-on-first-use
+policy a host's first key is pinned and appended to the file, and a
+changed key is refused.
+"""
+
+import base64
+import os
+import threading
+
+import paramiko
+
+# How unknown and changed host keys are handled
+HOST_KEY_POLICIES = ('tofu', 'strict', 'off')
+
+
+class HostKeyError(paramiko.SSHException):
+    """Raised when a server's host key is unknown (strict) or doesn't match the pinned key"""
+
+
+class KeyCache:
+    """Parsed private keys keyed by path, reloaded when the file's mtime changes"""
+
+    def __init__(self):
+        self._keys = {}  # (library, path) -> (mtime, key)
+        self._lock = threading.Lock()
+
+    def _get(self, library, path, parse):
+        path = os.path.abspath(os.path.expanduser(path))
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._keys.get((library, path))
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        key = parse(path)
+        with self._lock:
+            self._keys[(library, path)] = (mtime, key)
+        return key
+
+    def paramiko_key(self, path):
+        return self._get('paramiko', path, paramiko.PKey.from_path)
+
+    def asyncssh_key(self, path):
+        import asyncssh
+        return self._get('asyncssh', path, asyncssh.read_private_key)
+
+
+def host_id(host, port):
+    """known_hosts name for a host: ``host`` on port 22, ``[host]:port`` otherwise"""
+    return host if port in (None, 22) else f"[{host}]:{port}"
+
+
+class KnownHosts:
+    """Pinned host keys from an OpenSSH-style known_hosts file, kept in memory
+
+    The file is read once; newly pinned keys are appended so hand-written
+    entries (including hashed ones, which are skipped here) are preserved.
+    A host may have one pinned key per key type.
+    """
+
+    def __init__(self, path='known_hosts', policy='tofu'):
+        if policy not in HOST_KEY_POLICIES:
+            raise ValueError(f"HOST_KEY_POLICY must be one of {', '.join(HOST_KEY_POLICIES)}")
+        self.path = path
+        self.policy = policy
+        self._keys = {}  # host id -> {key type: base64}
+        self._parsed = {}  # (library, key type, base64) -> public key object
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as file:
+                lines = file.read().splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            parts = line.split()
+            if len(parts) < 3 or line.startswith(('#', '@', '|')):
+                continue
+            names, key_type, data = parts[:3]
+            for name in names.split(','):
+                self._keys.setdefault(name, {})[key_type] = data
+
+    def keys_for(self, name):
+        with self._lock:
+            return dict(self._keys.get(name, {}))
+
+    def verify(self, name, key_type, data):
+        """Check (and on first use pin) a server key; raises HostKeyError if it isn't trusted"""
+        if self.policy == 'off':
+            return
+        with self._lock:
+            pinned = self._keys.get(name)
+            if pinned and pinned.get(key_type) == data:
+                return
+            if pinned:
+                raise HostKeyError(
+                    f"Host key for {name} changed ({key_type}) - if this is expected, "
+                    f"remove its entry from {self.path}"
+                )
+            if self.policy == 'strict':
+                raise HostKeyError(f"Unknown host key for {name} ({key_type}) and HOST_KEY_POLICY=strict")
+            self._keys[name] = {key_type: data}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as file:
+                file.write(f"{name} {key_type} {data}\n")
+
+    def _parse(self, library, key_type, data, parse):
+        cache_key = (library, key_type, data)
+        key = self._parsed.get(cache_key)
+        if key is None:
+            key = self._parsed[cache_key] = parse()
+        return key
+
+    def prepare_client(self, client, host, port):
+        """Load pinned keys into a paramiko SSHClient and install the pinning policy
+
+        With the pinned keys present paramiko negotiates the same key type
+        as before and rejects a changed key itself; unknown hosts go to the
+        policy.
+        """
+        if self.policy == 'off':
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            return
+        name = host_id(host, port)
+        for key_type, data in self.keys_for(name).items():
+            try:
+                key = self._parse('paramiko', key_type, data, lambda: paramiko.PKey.from_type_string(
+                    key_type, base64.b64decode(data)))
+            except (paramiko.SSHException, ValueError):
+                continue  # Key type paramiko can't handle
+            client.get_host_keys().add(name, key_type, key)
+        client.set_missing_host_key_policy(PinningPolicy(self))
+
+    def asyncssh_known_hosts(self, host, addr, port):
+        """``known_hosts`` callable for asyncssh.connect: the host's pinned keys"""
+        import asyncssh
+        keys = []
+        for key_type, data in self.keys_for(host_id(host, port)).items():
+            try:
+                keys.append(self._parse('asyncssh', key_type, data,
+                                        lambda: asyncssh.import_public_key(f"{key_type} {data}")))
+            except (asyncssh.KeyImportError, ValueError):
+                continue
+        return keys, [], []
+
+
+class PinningPolicy(paramiko.MissingHostKeyPolicy):
+    """Paramiko policy that pins unknown host keys through KnownHosts"""
+
+    def __init__(self, known_hosts):
+        self.known_hosts = known_hosts
+
+    def missing_host_key(self, client, hostname, key):
+        self.known_hosts.verify(hostname, key.get_name(), key.get_base64())
+
+
+def asyncssh_client_factory(known_hosts, host, port):
+    """asyncssh client_factory whose host key check pins through KnownHosts"""
+    import asyncssh
+
+    class PinningClient(asyncssh.SSHClient):
+        def validate_host_public_key(self, _host, addr, _port, key):
+            key_type, data = key.export_public_key('openssh').decode().split()[:2]
+            try:
+                known_hosts.verify(host_id(host, port), key_type, data)
+            except HostKeyError:
+                return False
+            return True
+
+    return PinningClient
+
+
+_key_cache = KeyCache()
+_known_hosts = None
+_known_hosts_lock = threading.Lock()
+
+
+def get_key_cache():
+    """Return the process-wide private key cache"""
+    return _key_cache
+
+
+def get_known_hosts():
+    """Return the process-wide pinned known_hosts store, loading it on first use"""
+    global _known_hosts
+    with _known_hosts_lock:
+        if _known_hosts is None:
+            _known_hosts = KnownHosts(
+                path=os.environ.get('KNOWN_HOSTS_FILE', 'known_hosts'),
+                policy=os.environ.get('HOST_KEY_POLICY', 'tofu'),
+            )
+        return _known_hosts
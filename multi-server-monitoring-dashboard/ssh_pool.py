@@ -0,0 +1,263 @@
+"""
+SSH Connection Pool
+Keeps authenticated Paramiko transports alive between dashboard reruns
+"""
+
+import os
+import threading
+import time
+
+import paramiko
+
+from circuit import tcp_precheck
+from ssh_keys import get_key_cache, get_known_hosts
+
+
+class PooledConnection:
+    """A single authenticated SSH client plus its bookkeeping"""
+
+    def __init__(self, client):
+        self.client = client
+        self.created = time.time()
+        self.last_used = self.created
+        self.in_use = 0  # Commands currently running on this connection
+
+    @property
+    def transport(self):
+        return self.client.get_transport()
+
+    def is_healthy(self):
+        """Check that the underlying transport is still usable"""
+        transport = self.transport
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            # Cheap liveness probe - raises if the socket is dead
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass  # Ignore errors during cleanup
+
+
+class SSHConnectionPool:
+    """Process-wide pool of SSH connections keyed by (host, port, user, key)
+
+    Connections are reused across Streamlit reruns and sessions. Dead
+    connections are replaced transparently, repeated connect failures back
+    off exponentially and connections idle for longer than ``idle_timeout``
+    are closed.
+    """
+
+    def __init__(self, idle_timeout=300, keepalive_interval=30,
+                 connect_timeout=8, precheck_timeout=1.5, base_backoff=2, max_backoff=60):
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.connect_timeout = connect_timeout
+        self.precheck_timeout = precheck_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._connections = {}
+        self._failures = {}  # key -> (failure_count, retry_after)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(server):
+        """Pool key for a server entry from servers.yml"""
+        key_file = server.get('key_file')
+        if key_file:
+            key_file = os.path.expanduser(key_file)
+        return (server['host'], server.get('port', 22), server.get('username'), key_file)
+
+    def _lock_for(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _connect(self, key):
+        host, port, username, key_file = key
+
+        # Cheap TCP check first so dead hosts fail in ~1s instead of the full SSH timeouts
+        tcp_precheck(host, port, self.precheck_timeout)
+
+        ssh = paramiko.SSHClient()
+        # Pinned host keys from the shared known_hosts store; unknown hosts are pinned on first use
+        get_known_hosts().prepare_client(ssh, host, port)
+        ssh.connect(
+            hostname=host,
+            port=port,
+            username=username,
+            pkey=get_key_cache().paramiko_key(key_file) if key_file else None,
+            timeout=self.connect_timeout,
+            banner_timeout=self.connect_timeout,
+            auth_timeout=self.connect_timeout,
+            look_for_keys=False,  # Only use specified key
+            allow_agent=False  # Don't use SSH agent (avoids hangs)
+        )
+        # Keepalives stop NAT/firewalls from dropping idle pooled sessions
+        ssh.get_transport().set_keepalive(self.keepalive_interval)
+        return PooledConnection(ssh)
+
+    def _checkout(self, key, hold):
+        """Return a healthy PooledConnection for key (caller holds the key lock)"""
+        conn = self._connections.get(key)
+        if conn is not None:
+            if conn.is_healthy():
+                conn.last_used = time.time()
+                conn.in_use += hold
+                return conn
+            conn.close()
+            del self._connections[key]
+
+        failures, retry_after = self._failures.get(key, (0, 0))
+        remaining = retry_after - time.time()
+        if remaining > 0:
+            raise ConnectionError(
+                f"Reconnect backoff after {failures} failure(s), retrying in {remaining:.0f}s"
+            )
+
+        try:
+            conn = self._connect(key)
+        except Exception:
+            failures += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (failures - 1))
+            self._failures[key] = (failures, time.time() + delay)
+            raise
+
+        self._failures.pop(key, None)
+        self._connections[key] = conn
+        conn.in_use += hold
+        return conn
+
+    def get_client(self, server):
+        """Return a connected SSHClient for the server, reconnecting if needed"""
+        key = self.make_key(server)
+        with self._lock_for(key):
+            return self._checkout(key, hold=0).client
+
+    def invalidate(self, server):
+        """Drop the pooled connection for a server (e.g. after a channel error)"""
+        key = self.make_key(server)
+        with self._lock_for(key):
+            conn = self._connections.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+    def exec_command(self, server, command, timeout=5):
+        """Run a command over the pooled connection
+
+        Returns (stdout, stderr, exit_status). A broken connection is evicted
+        from the pool so the next call reconnects. The channel is always
+        closed, so timeouts don't pile up half-open sessions on the
+        connection until the server's MaxSessions is reached.
+        """
+        key = self.make_key(server)
+        with self._lock_for(key):
+            conn = self._checkout(key, hold=1)
+        client = conn.client
+        channel = None
+        try:
+            stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+            channel = stdout.channel
+            output = stdout.read().decode('utf-8', errors='ignore')
+            error = stderr.read().decode('utf-8', errors='ignore')
+            exit_status = stdout.channel.recv_exit_status()
+            return output, error, exit_status
+        except (paramiko.SSHException, EOFError, OSError):
+            transport = client.get_transport()
+            if transport is None or not transport.is_active():
+                self.invalidate(server)
+            raise
+        finally:
+            if channel is not None:
+                channel.close()
+            with self._lock_for(key):
+                conn.in_use -= 1
+                conn.last_used = time.time()
+
+    def evict_idle(self):
+        """Close connections that have been idle longer than idle_timeout
+
+        Takes each host's lock, so a connection being checked out or running
+        a command is never closed underneath its user.
+        """
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            stale = [key for key, conn in self._connections.items() if conn.last_used < cutoff]
+        evicted = []
+        for key in stale:
+            lock = self._lock_for(key)
+            if not lock.acquire(blocking=False):
+                continue  # In use right now - not idle
+            try:
+                conn = self._connections.get(key)
+                if conn is not None and not conn.in_use and conn.last_used < cutoff:
+                    evicted.append(self._connections.pop(key))
+            finally:
+                lock.release()
+        for conn in evicted:
+            conn.close()
+        return len(evicted)
+
+    def close_all(self):
+        with self._lock:
+            conns = list(self._connections.values())
+            self._connections.clear()
+            self._failures.clear()
+        for conn in conns:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': len(self._connections),
+                'backing_off': sum(1 for _, retry in self._failures.values() if retry > time.time()),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_reaper_started = False
+
+
+def _reap_idle_connections(pool, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            pool.evict_idle()
+        except Exception:
+            pass
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use
+
+    Streamlit re-executes app.py on every rerun but keeps imported modules,
+    so this pool is shared by all sessions in the server process.
+    """
+    global _pool, _reaper_started
+    with _pool_lock:
+        if _pool is None:
+            _pool = SSHConnectionPool(
+                idle_timeout=int(os.environ.get('SSH_POOL_IDLE_TIMEOUT', 300)),
+                keepalive_interval=int(os.environ.get('SSH_POOL_KEEPALIVE', 30)),
+            )
+        if not _reaper_started:
+            reaper = threading.Thread(
+                target=_reap_idle_connections,
+                args=(_pool, max(10, _pool.idle_timeout // 4)),
+                name='ssh-pool-reaper',
+                daemon=True
+            )
+            reaper.start()
+            _reaper_started = True
+        return _pool
@@ -5,9 +5,20 @@ each hosting different model families (Qwen, Llama, Granite, Mistral, etc.)
 optimized for different hardware configurations.
 """
 
+import asyncio
 import os
-from typing import Dict, List, Tuple
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from uuid import UUID
+
+import httpx
 from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_ollama import ChatOllama
 
 # Load environment variables
@@ -20,6 +31,42 @@ SERVERS = {
     "server_large": os.getenv("OLLAMA_SERVER_LARGE", "http://localhost:11436"),
 }
 
+# Client registry and HTTP connection pool limits
+CLIENT_CACHE_SIZE = int(os.getenv("FLEET_CLIENT_CACHE_SIZE", "64"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("FLEET_HTTP_MAX_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("FLEET_HTTP_KEEPALIVE_EXPIRY", "300"))
+
+# Model discovery (/api/ps is polled every interval, /api/tags less often)
+DISCOVERY_ENABLED = os.getenv("FLEET_DISCOVERY", "true").lower() in ("1", "true", "yes")
+DISCOVERY_INTERVAL = float(os.getenv("FLEET_DISCOVERY_INTERVAL", "15"))
+DISCOVERY_TAGS_INTERVAL = float(os.getenv("FLEET_DISCOVERY_TAGS_INTERVAL", "300"))
+DISCOVERY_TIMEOUT = float(os.getenv("FLEET_DISCOVERY_TIMEOUT", "2"))
+
+# Load-aware routing
+NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))  # Requests each server runs at once
+ROUTER_EWMA_ALPHA = float(os.getenv("FLEET_ROUTER_EWMA_ALPHA", "0.3"))
+ROUTER_COLD_PENALTY = float(os.getenv("FLEET_ROUTER_COLD_PENALTY", "10"))  # Seconds to load a model
+ROUTER_DEFAULT_LATENCY = 1.0  # Assumed for servers without any completed request yet
+
+# Batch inference
+BATCH_RETRIES = int(os.getenv("FLEET_BATCH_RETRIES", "2"))
+BATCH_RETRY_BACKOFF = float(os.getenv("FLEET_BATCH_RETRY_BACKOFF", "1"))
+
+# Preload scheduler
+PRELOAD_INTERVAL = float(os.getenv("FLEET_PRELOAD_INTERVAL", "60"))
+PRELOAD_KEEP_ALIVE = os.getenv("FLEET_PRELOAD_KEEP_ALIVE", "30m")
+PRELOAD_HALF_LIFE = float(os.getenv("FLEET_PRELOAD_HALF_LIFE", "600"))  # Seconds for request rates to halve
+PRELOAD_TIMEOUT = float(os.getenv("FLEET_PRELOAD_TIMEOUT", "300"))  # Loading a large model takes minutes
+PRELOAD_MIN_SCORE = 0.1  # Below this a model is cold
+VRAM_OVERHEAD = 1.2  # VRAM use vs. model file size (KV cache, CUDA buffers)
+
+# Per-server VRAM budget in GB (0 = don't manage that server)
+VRAM_BUDGETS = {
+    "server_small": float(os.getenv("OLLAMA_SERVER_SMALL_VRAM_GB", "0")),
+    "server_medium": float(os.getenv("OLLAMA_SERVER_MEDIUM_VRAM_GB", "0")),
+    "server_large": float(os.getenv("OLLAMA_SERVER_LARGE_VRAM_GB", "0")),
+}
+
 # Available models by family
 MODELS = {
     "qwen": [
@@ -64,6 +111,558 @@ RECOMMENDATIONS = {
 }
 
 
+class ServerLoad(BaseCallbackHandler):
+    """In-flight requests and a latency EWMA for one server.
+
+    Attached as a LangChain callback to every client the registry creates
+    for the server, so all traffic through get_model and the router counts.
+    """
+
+    run_inline = True
+
+    def __init__(self, alpha: float = ROUTER_EWMA_ALPHA):
+        self.alpha = alpha
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self._started: Dict[UUID, Tuple[float, Optional[str]]] = {}
+        self._served: Dict[str, float] = {}  # model -> last successful response
+        self.model_requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self, run_id: UUID, model: Optional[str] = None) -> None:
+        with self._lock:
+            self._started[run_id] = (time.monotonic(), model)
+            self.in_flight += 1
+            if model:
+                model = normalize_model(model)
+                self.model_requests[model] = self.model_requests.get(model, 0) + 1
+
+    def finish(self, run_id: UUID, ok: bool = True) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started is None:
+                return
+            start, model = started
+            elapsed = time.monotonic() - start
+            self.in_flight -= 1
+            self.requests += 1
+            if not ok:
+                # A failing server should look slow, not fast
+                self.errors += 1
+                elapsed = max(elapsed, 2 * (self.latency or ROUTER_DEFAULT_LATENCY))
+            elif model:
+                self._served[normalize_model(model)] = time.monotonic()
+            self.latency = elapsed if self.latency is None else (
+                self.alpha * elapsed + (1 - self.alpha) * self.latency)
+
+    def served_recently(self, model_name: str, seconds: float) -> bool:
+        """Whether the server answered for this model in the last ``seconds`` (so it is loaded)."""
+        with self._lock:
+            served = self._served.get(normalize_model(model_name))
+        return served is not None and time.monotonic() - served < seconds
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self.start(run_id, (metadata or {}).get("ls_model_name"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self.start(run_id, (metadata or {}).get("ls_model_name"))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        self.finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self.finish(run_id, ok=False)
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """Async transport with one connection pool per event loop.
+
+    httpx async connections belong to the loop that opened them, so a
+    cached client used from a second asyncio.run() would fail on the first
+    loop's pooled connections. This keeps a separate pool per running loop
+    and forgets it when the loop is garbage collected.
+    """
+
+    def __init__(self):
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary())
+        self._lock = threading.Lock()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = httpx.AsyncHTTPTransport(limits=_pool_limits())
+            return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.pop(loop, None)
+        if pool is not None:
+            await pool.aclose()
+
+    def close(self) -> None:
+        """Close every loop's pool from synchronous code.
+
+        Each pool is closed on its own loop: scheduled there if the loop is
+        running, run to completion if it is idle. Pools of closed loops are
+        dropped - their connections died with the loop.
+        """
+        with self._lock:
+            pools = list(self._pools.items())
+            self._pools.clear()
+        for loop, pool in pools:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(pool.aclose(), loop)
+            else:
+                loop.run_until_complete(pool.aclose())
+
+
+class ClientRegistry:
+    """LRU cache of ChatOllama clients with one shared HTTP connection pool per server.
+
+    Clients are keyed by (model, base_url, temperature, format). All clients
+    for the same base_url send requests through one keep-alive httpx
+    transport (and one async pool per event loop), so new clients (and evicted-then-recreated ones) reuse warm
+    connections instead of opening their own. Cached clients are shared
+    between callers and should be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = CLIENT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clients: "OrderedDict[Tuple[str, str, float, str], ChatOllama]" = OrderedDict()
+        self._transports: Dict[str, httpx.HTTPTransport] = {}
+        self._async_transports: Dict[str, LoopLocalTransport] = {}
+        self._http: Dict[str, httpx.Client] = {}
+        self._loads: Dict[str, ServerLoad] = {}
+        self._lock = threading.Lock()
+
+    def transport(self, base_url: str) -> httpx.HTTPTransport:
+        """Return the shared keep-alive transport (connection pool) for a server."""
+        with self._lock:
+            transport = self._transports.get(base_url)
+            if transport is None:
+                transport = self._transports[base_url] = httpx.HTTPTransport(limits=_pool_limits())
+            return transport
+
+    def async_transport(self, base_url: str) -> LoopLocalTransport:
+        """Return the shared async transport (one pool per event loop) for a server."""
+        with self._lock:
+            transport = self._async_transports.get(base_url)
+            if transport is None:
+                transport = self._async_transports[base_url] = LoopLocalTransport()
+            return transport
+
+    def http(self, base_url: str) -> httpx.Client:
+        """Return a plain httpx client for the Ollama REST API on the shared pool."""
+        transport = self.transport(base_url)
+        with self._lock:
+            client = self._http.get(base_url)
+            if client is None:
+                client = self._http[base_url] = httpx.Client(base_url=base_url, transport=transport)
+            return client
+
+    def load(self, base_url: str) -> ServerLoad:
+        """Return the load tracker shared by all clients for a server."""
+        with self._lock:
+            load = self._loads.get(base_url)
+            if load is None:
+                load = self._loads[base_url] = ServerLoad()
+            return load
+
+    def get(self, model_name: str, base_url: str, temperature: float = 0.0, format: str = "") -> ChatOllama:
+        """Return the cached client for these settings, creating it on a miss."""
+        key = (model_name, base_url, float(temperature), format)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+
+        client = ChatOllama(
+            model=model_name,
+            temperature=temperature,
+            format=format,
+            base_url=base_url,
+            sync_client_kwargs={"transport": self.transport(base_url)},
+            async_client_kwargs={"transport": self.async_transport(base_url)},
+            callbacks=[self.load(base_url)],
+        )
+        with self._lock:
+            # Another thread may have created the same client meanwhile - keep the first one
+            existing = self._clients.get(key)
+            if existing is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return existing
+            self.misses += 1
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def clear(self) -> None:
+        """Drop all cached clients and close the shared connection pools."""
+        with self._lock:
+            clients = list(self._http.values())
+            transports = list(self._transports.values())
+            async_transports = list(self._async_transports.values())
+            self._clients.clear()
+            self._transports.clear()
+            self._async_transports.clear()
+            self._http.clear()
+        for client in clients:
+            client.close()
+        for transport in transports:
+            transport.close()
+        for async_transport in async_transports:
+            async_transport.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "servers": len(self._transports),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide registry used by get_model
+registry = ClientRegistry()
+
+
+def normalize_model(model_name: str) -> str:
+    """Ollama's canonical model name - "mistral" is "mistral:latest"."""
+    return model_name if ":" in model_name else f"{model_name}:latest"
+
+
+class ModelIndex:
+    """Live model -> server placement, built from each server's /api/tags and /api/ps.
+
+    Servers are refreshed independently: a server's loaded models (/api/ps)
+    are re-read once they are older than ``interval`` and its installed
+    models (/api/tags) once they are older than ``tags_interval``. Only the
+    index entries of models that changed on that server are touched. A
+    server that doesn't answer is left out until it does again.
+
+    Lookups (servers_for, resolve, snapshot) only read the cached index;
+    polling happens in a daemon thread that the first lookup starts.
+    """
+
+    def __init__(
+        self,
+        servers: Optional[Dict[str, str]] = None,
+        interval: float = DISCOVERY_INTERVAL,
+        tags_interval: float = DISCOVERY_TAGS_INTERVAL,
+        timeout: float = DISCOVERY_TIMEOUT,
+    ):
+        self.servers = SERVERS if servers is None else servers
+        self.interval = interval
+        self.tags_interval = tags_interval
+        self.timeout = timeout
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._installed: Dict[str, Set[str]] = {}  # model -> base_urls
+        self._loaded: Dict[str, Set[str]] = {}  # model -> base_urls
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._tags_wanted = False
+        self._tags_wanted_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def base_urls(self) -> List[str]:
+        """Configured servers, without duplicates (several keys may share one server)."""
+        return list(dict.fromkeys(self.servers.values()))
+
+    def _fetch(self, base_url: str, path: str) -> List[Dict[str, Any]]:
+        response = registry.http(base_url).get(path, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get("models") or []
+
+    @staticmethod
+    def _reindex(index: Dict[str, Set[str]], base_url: str, old: Set[str], new: Set[str]) -> None:
+        for model in old - new:
+            servers = index.get(model)
+            if servers is not None:
+                servers.discard(base_url)
+                if not servers:
+                    del index[model]
+        for model in new - old:
+            index.setdefault(model, set()).add(base_url)
+
+    def refresh_server(self, base_url: str, tags: bool = True) -> None:
+        """Re-read one server's loaded (and, if ``tags``, installed) models."""
+        now = time.time()
+        with self._lock:
+            state = self._state.setdefault(base_url, {
+                "installed": set(), "sizes": {}, "loaded": {}, "ps_at": 0.0, "tags_at": 0.0, "error": None,
+            })
+        try:
+            installed = sizes = None
+            if tags:
+                # Both endpoints at once, so a full refresh costs one round trip
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    tags_future = executor.submit(self._fetch, base_url, "/api/tags")
+                    ps_models = self._fetch(base_url, "/api/ps")
+                    tags_models = tags_future.result()
+                sizes = {normalize_model(m["name"]): m.get("size", 0) for m in tags_models}
+                installed = set(sizes)
+            else:
+                ps_models = self._fetch(base_url, "/api/ps")
+            loaded = {normalize_model(m["name"]): m.get("size_vram", 0) for m in ps_models}
+            error = None
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            loaded, installed, sizes, error = {}, set(), {}, str(e) or type(e).__name__
+
+        with self._lock:
+            if installed is None:
+                installed = set(state["installed"])
+            installed |= set(loaded)  # A loaded model is installed even if /api/tags is stale
+            self._reindex(self._loaded, base_url, set(state["loaded"]), set(loaded))
+            self._reindex(self._installed, base_url, state["installed"], installed)
+            state.update(loaded=loaded, installed=installed, ps_at=now, error=error)
+            if sizes is not None:
+                state["sizes"] = sizes
+            if tags or error:
+                state["tags_at"] = now
+
+    def refresh(self, force: bool = False, tags_max_age: Optional[float] = None) -> None:
+        """Refresh every server whose data is stale, in parallel."""
+        tags_max_age = self.tags_interval if tags_max_age is None else tags_max_age
+        now = time.time()
+        due = []
+        with self._lock:
+            for base_url in self.base_urls():
+                state = self._state.get(base_url, {})
+                if base_url in self._refreshing:
+                    continue  # Another thread is on it - use what we have
+                ps_due = now - state.get("ps_at", 0.0) >= self.interval
+                # A server that was down gets a full refresh when it is retried
+                tags = force or now - state.get("tags_at", 0.0) >= tags_max_age or (ps_due and state.get("error"))
+                if tags or ps_due:
+                    self._refreshing.add(base_url)
+                    due.append((base_url, tags))
+        if not due:
+            return
+        try:
+            if len(due) == 1:
+                self.refresh_server(*due[0])
+            else:
+                with ThreadPoolExecutor(max_workers=len(due)) as executor:
+                    list(executor.map(lambda item: self.refresh_server(*item), due))
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(base_url for base_url, _ in due)
+
+    def start(self) -> None:
+        """Poll the servers from a daemon thread, every ``interval`` seconds."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="fleet-discovery", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                tags_max_age = self.interval if self._tags_wanted else None
+                self._tags_wanted = False
+            try:
+                self.refresh(tags_max_age=tags_max_age)
+            except Exception:
+                pass  # Per-server errors are recorded by refresh_server; keep polling
+            self._wake.wait(self.interval)
+
+    def servers_for(self, model_name: str) -> Tuple[List[str], List[str]]:
+        """(servers with the model loaded in VRAM, servers with it installed), from the cached index."""
+        self.start()
+        model = normalize_model(model_name)
+        order = self.base_urls()
+        with self._lock:
+            if model not in self._installed and time.time() - self._tags_wanted_at >= self.interval:
+                # Maybe it was pulled since the last /api/tags - have the poller look, at most once per interval
+                self._tags_wanted = True
+                self._tags_wanted_at = time.time()
+                self._wake.set()
+            loaded = self._loaded.get(model, set())
+            installed = self._installed.get(model, set())
+            return [url for url in order if url in loaded], [url for url in order if url in installed]
+
+    def reachable(self, base_url: str) -> bool:
+        """False if the server's last poll failed."""
+        with self._lock:
+            return not self._state.get(base_url, {}).get("error")
+
+    def resolve(self, model_name: str, preferred: str) -> str:
+        """Pick a server for a model: hot beats installed, and ``preferred`` wins ties.
+
+        Falls back to ``preferred`` when no server reports the model, which
+        includes the first calls before the poller has heard from any server.
+        """
+        loaded, installed = self.servers_for(model_name)
+        for candidates in (loaded, installed):
+            if preferred in candidates:
+                return preferred
+            if candidates:
+                return candidates[0]
+        return preferred
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-server view: installed models and file sizes, loaded models and VRAM, age and last error."""
+        self.start()
+        now = time.time()
+        with self._lock:
+            return {
+                base_url: {
+                    "installed": sorted(state["installed"]),
+                    "sizes": dict(state["sizes"]),
+                    "loaded": dict(state["loaded"]),
+                    "age": now - state["ps_at"],
+                    "error": state["error"],
+                }
+                for base_url, state in self._state.items()
+            }
+
+
+# Process-wide placement index used by get_model
+model_index = ModelIndex()
+
+
+class Router:
+    """Load-aware server choice using the power of two choices.
+
+    Eligible servers are those that have the model loaded or installed (any
+    reachable server if none does). Two of them are sampled at random and
+    the one with the lower expected wait wins. Expected wait is the latency
+    EWMA scaled by how busy the server's NUM_PARALLEL slots are, plus
+    ``cold_penalty`` if the model isn't loaded there. Sampling two rather
+    than taking the global minimum keeps concurrent callers from all
+    piling onto the same "best" server between updates.
+    """
+
+    def __init__(self, index: ModelIndex = model_index, cold_penalty: float = ROUTER_COLD_PENALTY):
+        self.index = index
+        self.cold_penalty = cold_penalty
+
+    def allowed(self, servers: Optional[List[str]] = None) -> List[str]:
+        """base_urls for the given server keys (default: all configured servers).
+
+        Raises:
+            ValueError: If none of the keys is a configured server
+        """
+        allowed = list(dict.fromkeys(
+            self.index.servers[key] for key in servers if key in self.index.servers
+        )) if servers else self.index.base_urls()
+        if not allowed:
+            raise ValueError(
+                f"No configured Ollama server among {servers or []}; "
+                f"expected one of {sorted(self.index.servers)}"
+            )
+        return allowed
+
+    def candidates(self, model_name: str, servers: Optional[List[str]] = None) -> Tuple[List[str], Set[str]]:
+        """(eligible base_urls, those with the model hot) for a model; never empty."""
+        allowed = self.allowed(servers)
+        if not DISCOVERY_ENABLED:
+            return allowed, set()
+
+        loaded, installed = self.index.servers_for(model_name)
+        hot = set(loaded) | {
+            url for url in allowed if registry.load(url).served_recently(model_name, self.index.interval)
+        }
+        eligible = [url for url in allowed if url in hot or url in installed]
+        if not eligible:
+            eligible = [url for url in allowed if self.index.reachable(url)] or allowed
+        return eligible, hot
+
+    def score(self, base_url: str, hot: bool = True) -> float:
+        """Expected seconds until a new request to this server completes."""
+        load = registry.load(base_url)
+        latency = ROUTER_DEFAULT_LATENCY if load.latency is None else load.latency
+        wait = latency * (1 + load.in_flight / max(1, NUM_PARALLEL))
+        return wait if hot else wait + self.cold_penalty
+
+    def choose(self, model_name: str, servers: Optional[List[str]] = None) -> str:
+        """Pick the base_url for the next request to a model."""
+        eligible, hot = self.candidates(model_name, servers)
+        pair = random.sample(eligible, min(2, len(eligible)))
+        return min(pair, key=lambda url: self.score(url, url in hot))
+
+    def choose_among(
+        self,
+        model_names: Sequence[str],
+        servers: Optional[List[str]] = None,
+        available: Optional[Set[str]] = None,
+    ) -> Optional[Tuple[str, str]]:
+        """Pick the best (model, base_url) across interchangeable models.
+
+        Each model gets a power-of-two choice among its servers, limited to
+        ``available`` when given; the lowest score wins. Returns None if no
+        eligible server is available.
+        """
+        best, best_score = None, None
+        for model_name in model_names:
+            eligible, hot = self.candidates(model_name, servers)
+            if available is not None:
+                eligible = [url for url in eligible if url in available]
+            for url in random.sample(eligible, min(2, len(eligible))):
+                score = self.score(url, url in hot)
+                if best_score is None or score < best_score:
+                    best, best_score = (model_name, url), score
+        return best
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-server in-flight count, latency EWMA, request and error totals."""
+        stats = {}
+        for base_url in self.index.base_urls():
+            load = registry.load(base_url)
+            stats[base_url] = {
+                "in_flight": load.in_flight,
+                "latency": load.latency,
+                "requests": load.requests,
+                "errors": load.errors,
+            }
+        return stats
+
+
+# Process-wide router used by get_routed_model
+router = Router()
+
+
 def get_model(
     model_name: str,
     server: str = "server_small",
@@ -73,22 +672,331 @@ def get_model(
     """
     Get a configured LangChain ChatOllama instance.
 
+    Instances are cached in the shared ClientRegistry, so calling this per
+    request is cheap and reuses warm HTTP connections to the server.
+
+    With discovery enabled (FLEET_DISCOVERY) the model is sent to a server
+    that already has it loaded, then to one that has it installed; ``server``
+    is the preference among those and the fallback when none reports it.
+
     Args:
         model_name: Name of the Ollama model (e.g., "llama3.1:8b")
-        server: Server key from config (server_small, server_medium, server_large)
+        server: Preferred server key (server_small, server_medium, server_large)
         temperature: Sampling temperature (0.0 = deterministic)
         format: Output format (e.g., "json")
 
     Returns:
-        Configured ChatOllama instance
+        Configured ChatOllama instance (shared - don't mutate it)
     """
     base_url = SERVERS.get(server, SERVERS["server_small"])
-    return ChatOllama(
-        model=model_name,
-        temperature=temperature,
-        format=format,
-        base_url=base_url
-    )
+    if DISCOVERY_ENABLED:
+        base_url = model_index.resolve(model_name, base_url)
+    return registry.get(model_name, base_url, temperature, format)
+
+
+def get_routed_model(
+    model_name: str,
+    temperature: float = 0.0,
+    format: str = "",
+    servers: Optional[List[str]] = None
+) -> ChatOllama:
+    """
+    Get a ChatOllama instance on the least-loaded server that has the model.
+
+    Unlike get_model, the server is chosen per call from live load (in-flight
+    requests, latency EWMA) and placement, so call this for every request
+    rather than holding on to the result.
+
+    Args:
+        model_name: Name of the Ollama model (e.g., "llama3.1:8b")
+        temperature: Sampling temperature (0.0 = deterministic)
+        format: Output format (e.g., "json")
+        servers: Server keys to choose from (default: all configured servers)
+
+    Returns:
+        Configured ChatOllama instance (shared - don't mutate it)
+
+    Raises:
+        ValueError: If none of ``servers`` is a configured server key
+    """
+    base_url = router.choose(model_name, servers)
+    return registry.get(model_name, base_url, temperature, format)
+
+
+class PreloadScheduler:
+    """Keeps the models that matter resident in VRAM on each server.
+
+    Every tick scores each (server, model) pair. The score is the model's
+    request rate on that server, decayed with a ``half_life``, plus 1 if
+    RECOMMENDATIONS places the model there. On each server with a VRAM
+    budget, models the server has installed are taken from the highest
+    score down while they fit the budget, with ties going to models already
+    loaded so equal scores never trade one load for another. Those models are preloaded, or
+    have their keep_alive extended if already loaded. Other loaded models
+    are unloaded (coldest first) only when the chosen set wouldn't fit
+    otherwise. Servers without a budget are left alone.
+    """
+
+    def __init__(
+        self,
+        index: ModelIndex = model_index,
+        budgets_gb: Optional[Dict[str, float]] = None,
+        keep_alive: str = PRELOAD_KEEP_ALIVE,
+        half_life: float = PRELOAD_HALF_LIFE,
+    ):
+        self.index = index
+        self.keep_alive = keep_alive
+        self.half_life = half_life
+        self.budgets: Dict[str, int] = {}
+        for key, gb in (VRAM_BUDGETS if budgets_gb is None else budgets_gb).items():
+            if gb > 0 and key in index.servers:
+                base_url = index.servers[key]
+                # Keys sharing one server share its budget
+                self.budgets[base_url] = max(self.budgets.get(base_url, 0), int(gb * 1024 ** 3))
+        self.rates: Dict[Tuple[str, str], float] = {}
+        self.last_actions: List[Tuple[str, str, str]] = []
+        self._seen: Dict[Tuple[str, str], int] = {}
+        self._last_tick: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _update_rates(self) -> None:
+        """Fold the requests since the last tick into the decayed per-server rates."""
+        now = time.monotonic()
+        elapsed = 0.0 if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        decay = 0.5 ** (elapsed / self.half_life) if self.half_life > 0 else 0.0
+        self.rates = {pair: rate * decay for pair, rate in self.rates.items() if rate * decay >= 0.01}
+        for base_url in self.index.base_urls():
+            for model, count in list(registry.load(base_url).model_requests.items()):
+                pair = (base_url, model)
+                new = count - self._seen.get(pair, 0)
+                self._seen[pair] = count
+                if new:
+                    self.rates[pair] = self.rates.get(pair, 0.0) + new
+
+    def scores(self, base_url: str) -> Dict[str, float]:
+        """Model -> score on one server (only models with a reason to stay loaded)."""
+        scores = {model: rate for (url, model), rate in self.rates.items() if url == base_url}
+        for model, server in RECOMMENDATIONS.values():
+            if self.index.servers.get(server) == base_url:
+                model = normalize_model(model)
+                scores[model] = scores.get(model, 0.0) + 1.0
+        return {model: score for model, score in scores.items() if score >= PRELOAD_MIN_SCORE}
+
+    def plan(self, base_url: str, state: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        """(models to keep or load, in priority order; loaded models to unload)."""
+        budget = self.budgets[base_url]
+        loaded = state["loaded"]
+        scores = self.scores(base_url)
+
+        def size(model: str) -> int:
+            return loaded.get(model) or int(state["sizes"].get(model, 0) * VRAM_OVERHEAD)
+
+        keep, used = [], 0
+        for model in sorted(scores, key=lambda m: (scores[m], m in loaded), reverse=True):
+            if model in state["installed"] and used + size(model) <= budget:
+                keep.append(model)
+                used += size(model)
+
+        # Unload only under pressure: what's loaded plus what we're about to load must fit
+        needed = sum(loaded.values()) + sum(size(model) for model in keep if model not in loaded)
+        unload = []
+        for model in sorted((m for m in loaded if m not in keep), key=lambda m: scores.get(m, 0.0)):
+            if needed <= budget:
+                break
+            unload.append(model)
+            needed -= loaded[model]
+        return keep, unload
+
+    def _post(self, base_url: str, model: str, keep_alive: Union[str, int]) -> None:
+        # An empty generate request loads (or with keep_alive=0 unloads) a model without running it
+        response = registry.http(base_url).post(
+            "/api/generate", json={"model": model, "keep_alive": keep_alive}, timeout=PRELOAD_TIMEOUT)
+        response.raise_for_status()
+
+    def _apply(self, base_url: str, state: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        keep, unload = self.plan(base_url, state)
+        actions = []
+        for model in unload:
+            try:
+                self._post(base_url, model, 0)
+                actions.append(("unload", base_url, model))
+            except httpx.HTTPError as e:
+                actions.append(("error", base_url, f"unload {model}: {e}"))
+        for model in keep:
+            try:
+                self._post(base_url, model, self.keep_alive)
+                actions.append(("keep" if model in state["loaded"] else "load", base_url, model))
+            except httpx.HTTPError as e:
+                actions.append(("error", base_url, f"load {model}: {e}"))
+        if unload or any(action == "load" for action, _, _ in actions):
+            self.index.refresh_server(base_url, tags=False)
+        return actions
+
+    def tick(self) -> List[Tuple[str, str, str]]:
+        """Run one scheduling round; returns the (action, base_url, model) pairs taken."""
+        self._update_rates()
+        self.index.refresh()
+        snapshot = self.index.snapshot()
+        due = [(url, snapshot[url]) for url in self.budgets if url in snapshot and not snapshot[url]["error"]]
+        actions: List[Tuple[str, str, str]] = []
+        if due:
+            with ThreadPoolExecutor(max_workers=len(due)) as executor:
+                for server_actions in executor.map(lambda item: self._apply(*item), due):
+                    actions += server_actions
+        self.last_actions = actions
+        return actions
+
+    def start(self, interval: float = PRELOAD_INTERVAL) -> None:
+        """Run tick() every ``interval`` seconds in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.is_set():
+                try:
+                    self.tick()
+                except Exception as e:
+                    self.last_actions = [("error", "", str(e))]
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="fleet-preload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Process-wide preload scheduler (not started until preloader.start())
+preloader = PreloadScheduler()
+
+
+class BatchResult(NamedTuple):
+    """Outcome of one batch item; ``content`` is None if every attempt failed."""
+
+    index: int
+    content: Optional[str]
+    error: Optional[str]
+    model: str
+    server: str
+    attempts: int
+    seconds: float
+
+
+async def abatch_as_completed(
+    prompts: Sequence[Any],
+    model_name: Union[str, Sequence[str]] = "qwen2.5:7b",
+    temperature: float = 0.0,
+    format: str = "",
+    servers: Optional[List[str]] = None,
+    retries: int = BATCH_RETRIES,
+) -> AsyncIterator[BatchResult]:
+    """
+    Run many prompts across the fleet, yielding results as they complete.
+
+    Each item goes to the (model, server) pair the router picks among
+    servers that still have a free slot, so no server gets more than
+    OLLAMA_NUM_PARALLEL requests from the batch at once. Failed items are
+    retried with exponential backoff, and each retry is routed again (so
+    it can land on another server).
+
+    Args:
+        prompts: Prompts (strings or message lists) to send
+        model_name: Model, or interchangeable models to spread the batch over
+        temperature: Sampling temperature (0.0 = deterministic)
+        format: Output format (e.g., "json")
+        servers: Server keys to use (default: all configured servers)
+        retries: Extra attempts per failed item
+
+    Yields:
+        BatchResult for each prompt, in completion order
+
+    Raises:
+        ValueError: If none of ``servers`` is a configured server key
+    """
+    model_names = [model_name] if isinstance(model_name, str) else list(model_name)
+    base_urls = router.allowed(servers)
+    if DISCOVERY_ENABLED:
+        # Bring placement up to date off the event loop; from here on routing
+        # only reads the cached index, which the poller thread keeps fresh
+        model_index.start()
+        await asyncio.to_thread(model_index.refresh)
+    busy = {url: 0 for url in base_urls}
+    slots = asyncio.Condition()
+    items = iter(enumerate(prompts))
+    results: "asyncio.Queue[BatchResult]" = asyncio.Queue()
+
+    async def acquire() -> Tuple[str, str]:
+        async with slots:
+            while True:
+                free = {url for url, count in busy.items() if count < NUM_PARALLEL}
+                choice = router.choose_among(model_names, servers, available=free) if free else None
+                if choice is not None:
+                    busy[choice[1]] += 1
+                    return choice
+                await slots.wait()
+
+    async def release(base_url: str) -> None:
+        async with slots:
+            busy[base_url] -= 1
+            slots.notify_all()
+
+    async def worker() -> None:
+        for index, prompt in items:
+            start = time.monotonic()
+            content, error, model, base_url, attempt = None, None, model_names[0], "", 0
+            try:
+                for attempt in range(1, retries + 2):
+                    model, base_url = await acquire()
+                    try:
+                        llm = registry.get(model, base_url, temperature, format)
+                        message = await llm.ainvoke(prompt)
+                        content, error = message.content, None
+                    except Exception as e:
+                        content, error = None, f"{type(e).__name__}: {e}"
+                    finally:
+                        await release(base_url)
+                    if error is None or attempt > retries:
+                        break
+                    await asyncio.sleep(BATCH_RETRY_BACKOFF * 2 ** (attempt - 1))
+            except Exception as e:
+                content, error = None, f"{type(e).__name__}: {e}"
+            finally:
+                # Every item yields exactly one result, or the consumer would wait forever
+                results.put_nowait(BatchResult(
+                    index, content, error, model, base_url, attempt, time.monotonic() - start))
+
+    workers = [asyncio.create_task(worker())
+               for _ in range(min(len(prompts), max(1, NUM_PARALLEL * len(base_urls))))]
+    try:
+        for _ in range(len(prompts)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def abatch(prompts: Sequence[Any], **kwargs: Any) -> List[BatchResult]:
+    """
+    Run many prompts across the fleet and return results in input order.
+
+    Takes the same arguments as abatch_as_completed.
+    """
+    results: List[Optional[BatchResult]] = [None] * len(prompts)
+    async for result in abatch_as_completed(prompts, **kwargs):
+        results[result.index] = result
+    return results
+
+
+def batch(prompts: Sequence[Any], **kwargs: Any) -> List[BatchResult]:
+    """Synchronous abatch for scripts without an event loop."""
+    return asyncio.run(abatch(prompts, **kwargs))
 
 
 def get_recommended_model(
@@ -120,6 +1028,18 @@ def main():
     # Get recommendation
     model_name, server = get_recommended_model(use_case="code", size_preference="medium")
     print(f"Recommended for coding: {model_name} on {server}")
+
+    # Route by load instead of a fixed server
+    routed = get_routed_model(model_name)
+    print(f"Routed {model_name} to {routed.base_url}")
+
+    # Where models live right now
+    model_index.refresh()
+    for base_url, state in model_index.snapshot().items():
+        if state["error"]:
+            print(f"{base_url}: unreachable ({state['error']})")
+        else:
+            print(f"{base_url}: {len(state['installed'])} installed, loaded: {', '.join(state['loaded']) or 'none'}")
     
     # Test inference
     try: